@@ -0,0 +1,64 @@
+"""Measure how long `import jetkit.db, jetkit.api` takes in a fresh interpreter.
+
+Exits with an error if it takes longer than the budget, so it can run in CI.
+Run with `python -m bench.import_time [budget in seconds]`.
+"""
+import os
+import subprocess
+import sys
+
+STATEMENT = "import jetkit.db, jetkit.api"
+REPEAT = 5
+DEFAULT_BUDGET = 0.5
+SLOWEST = 10
+
+
+def import_time() -> float:
+    """Time the import in a new process, so nothing is imported yet."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"{STATEMENT}; print(time.perf_counter() - t)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "XRAY": ""},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(output)
+
+
+def slowest_modules() -> list:
+    """Get the modules taking longest to import themselves, from `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STATEMENT],
+        env={**os.environ, "XRAY": ""},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.partition(":")[2].split("|")
+        modules.append((int(self_us), name.strip()))
+    return sorted(modules, reverse=True)[:SLOWEST]
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET
+    best = min(import_time() for _ in range(REPEAT))
+    print(
+        f"{STATEMENT}: {best * 1000:.0f} ms, best of {REPEAT}, budget {budget * 1000:.0f} ms"
+    )
+    print("slowest modules:")
+    for self_us, name in slowest_modules():
+        print(f"  {self_us / 1000:7.1f} ms  {name}")
+    if best > budget:
+        sys.exit(f"import time over budget by {(best - budget) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure memory used by forked workers with and without `prepare_for_fork`.
+
+Loads an app in the parent, forks workers that run a garbage collection like a worker serving
+requests eventually would, and reports how much of each worker's memory is no longer shared.
+Linux only. Run with `python -m bench.prefork_rss`.
+"""
+import gc
+import os
+
+from jetkit.lifecycle import prepare_for_fork
+
+WORKERS = 4
+# objects standing in for imported modules, caches and other state loaded before forking
+PRELOADED_OBJECTS = 300_000
+
+
+def memory_kb() -> dict:
+    """Get resident and private (not shared with other processes) memory of this process."""
+    usage = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Private_Clean", "Private_Dirty"):
+                usage[name] = int(value.split()[0])
+    return dict(
+        rss=usage["Rss"], private=usage["Private_Clean"] + usage["Private_Dirty"]
+    )
+
+
+def fork_workers() -> list:
+    """Fork workers that collect garbage, and get their memory usage."""
+    results = []
+    for _ in range(WORKERS):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            gc.collect()
+            usage = memory_kb()
+            os.write(write_fd, f"{usage['rss']} {usage['private']}".encode())
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        rss, private = os.read(read_fd, 100).split()
+        os.close(read_fd)
+        results.append((int(rss), int(private)))
+    return results
+
+
+def report(label: str, results: list):
+    print(label)
+    for i, (rss, private) in enumerate(results):
+        print(
+            f"  worker {i}: RSS {rss / 1024:6.1f} MB, private {private / 1024:6.1f} MB"
+        )
+    total = sum(private for _, private in results) / 1024
+    print(f"  total private: {total:.1f} MB")
+
+
+def main():
+    from jetkit.test.app import create_app
+    import jetkit.test.model.asset  # noqa: F401
+    import jetkit.test.model.user  # noqa: F401
+
+    app = create_app(
+        config=dict(
+            SQLALCHEMY_DATABASE_URI=os.getenv(
+                "TEST_DATABASE_URL", "postgresql:///jetkit_bench"
+            ),
+            SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        )
+    )
+    preloaded = [
+        {"id": i, "name": f"row {i}", "tags": [i]} for i in range(PRELOADED_OBJECTS)
+    ]
+
+    report("without prepare_for_fork", fork_workers())
+    prepare_for_fork(app)
+    report("with prepare_for_fork", fork_workers())
+    gc.unfreeze()
+    del preloaded
+
+
+if __name__ == "__main__":
+    main()
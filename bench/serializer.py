@@ -0,0 +1,62 @@
+"""Benchmark compiled schema dumps against marshmallow.
+
+Run with `python -m bench.serializer`.
+"""
+import datetime
+import timeit
+import uuid
+from types import SimpleNamespace
+
+from marshmallow import Schema, fields as f
+
+from jetkit.api.serialization import compile_schema
+from jetkit.api.user.schema import UserSchema
+
+ROWS = 10_000
+REPEAT = 5
+
+
+class AuthResponse(Schema):
+    access_token = f.String(dump_only=True)
+    refresh_token = f.String(dump_only=True)
+    user = f.Nested(UserSchema)
+
+
+def make_user(n: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        extid=uuid.uuid4(),
+        name=f"User {n}",
+        email=f"user{n}@example.com",
+        dob=datetime.date(1990, 1, 1) + datetime.timedelta(days=n),
+        phone_number=None,
+    )
+
+
+def bench(name: str, schema: Schema, rows: list):
+    dump = compile_schema(schema)
+    assert dump(rows) == schema.dump(rows)
+
+    marshmallow_time = min(
+        timeit.repeat(lambda: schema.dump(rows), number=1, repeat=REPEAT)
+    )
+    compiled_time = min(timeit.repeat(lambda: dump(rows), number=1, repeat=REPEAT))
+    print(
+        f"{name:<14} marshmallow: {marshmallow_time * 1000:8.1f}ms"
+        f"  compiled: {compiled_time * 1000:8.1f}ms"
+        f"  speedup: {marshmallow_time / compiled_time:.1f}x"
+    )
+
+
+def main():
+    users = [make_user(n) for n in range(ROWS)]
+    auth_responses = [
+        dict(access_token="access", refresh_token="refresh", user=user)
+        for user in users
+    ]
+    print(f"Dumping {ROWS} rows, best of {REPEAT}")
+    bench("UserSchema", UserSchema(many=True), users)
+    bench("AuthResponse", AuthResponse(many=True), auth_responses)
+
+
+if __name__ == "__main__":
+    main()
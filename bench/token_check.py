@@ -0,0 +1,88 @@
+"""Benchmark the auth `check` endpoint with and without the verified token cache.
+
+Run with `python -m bench.token_check`.
+"""
+import timeit
+from types import SimpleNamespace
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from jetkit.api.auth.token_cache import EXTENSION_KEY, use_verified_token_cache
+
+REQUESTS = 2000
+REPEAT = 3
+
+
+def rsa_keys() -> dict:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_key = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_key = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return dict(JWT_PRIVATE_KEY=private_key, JWT_PUBLIC_KEY=public_key)
+
+
+def make_app(algorithm: str) -> Flask:
+    from jetkit.api.auth import blp, use_core_auth_api
+    from jetkit.test.model.user import User
+
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY="bench", JWT_ALGORITHM=algorithm)
+    if algorithm.startswith("RS"):
+        app.config.update(rsa_keys())
+    jwt = JWTManager(app)
+
+    # the check endpoint loads the user, without a database here
+    @jwt.user_loader_callback_loader
+    def load_user(identity):
+        return SimpleNamespace(id=identity)
+
+    use_core_auth_api(auth_model=User)
+    app.register_blueprint(blp)
+    return app
+
+
+def requests_per_second(app: Flask, token: str) -> float:
+    client = app.test_client()
+    environ = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+    response = client.get("/api/auth/check", environ_base=environ)
+    assert response.status_code == 200, response.status
+
+    def run():
+        for _ in range(REQUESTS):
+            client.get("/api/auth/check", environ_base=environ)
+
+    return REQUESTS / min(timeit.repeat(run, number=1, repeat=REPEAT))
+
+
+def bench(algorithm: str):
+    app = make_app(algorithm)
+    with app.app_context():
+        token = create_access_token(identity=1)
+        uncached = requests_per_second(app, token)
+        token_cache = use_verified_token_cache(app)
+        cached = requests_per_second(app, token)
+        del app.extensions[EXTENSION_KEY]
+    print(
+        f"{algorithm:<6} uncached: {uncached:8.0f} req/s"
+        f"  cached: {cached:8.0f} req/s"
+        f"  speedup: {cached / uncached:.1f}x"
+        f"  hit rate: {token_cache.stats.hit_rate:.1%}"
+    )
+
+
+def main():
+    print(f"GET /api/auth/check, {REQUESTS} requests, best of {REPEAT}")
+    bench("HS256")
+    bench("RS256")
+
+
+if __name__ == "__main__":
+    main()
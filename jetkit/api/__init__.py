@@ -1,14 +1,32 @@
+from collections import Counter
 from enum import Enum, unique
 from functools import wraps
 
 from sqlalchemy import Column, desc, nullslast
-from typing import Iterable, Callable
-from flask_jwt_extended import jwt_required, current_user
-from flask import request
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Iterable, Callable, Optional
+from flask_jwt_extended import jwt_required, get_current_user, get_jwt_claims
+from flask import current_app, request
 from flask_smorest import abort, Api, Page
+from werkzeug.exceptions import HTTPException
+
+from jetkit.db import Session
+from jetkit.db.utils import is_query_canceled, set_statement_timeout
 
 api = Api()
 
+# statement timeout applied to list endpoints (sortable_by, searchable_by, combined_search_by)
+# unless overridden with LIST_STATEMENT_TIMEOUT_MS in flask config. Set to 0 or None to disable.
+DEFAULT_LIST_STATEMENT_TIMEOUT_MS = 30000
+
+# how many requests were cancelled due to statement timeouts, by endpoint
+timed_out_endpoints: Counter = Counter()
+
+# access token claims set by jetkit.api.auth.user_loader
+USER_TYPE_CLAIM = "user_type"
+EXTID_CLAIM = "extid"
+
 
 class CursorPage(Page):
     @property
@@ -20,14 +38,16 @@ def permissions_required(permissions: Iterable) -> Callable:
     """
     Decorate functions that require user permissions control.
 
-    Pass permissions as a list of UserType enum values
+    Pass permissions as a list of UserType enum values.
+    Uses the user type claim of the access token if present, to avoid loading the user.
     """
+    permitted_values = {getattr(p, "value", p) for p in permissions}
 
     def decorator(f):
         @wraps(f)
         @jwt_required
         def decorated_function(*args, **kwargs):
-            if current_user.user_type not in permissions:
+            if current_user_type() not in permitted_values:
                 abort(404)
             return f(*args, **kwargs)
 
@@ -36,6 +56,91 @@ def permissions_required(permissions: Iterable) -> Callable:
     return decorator
 
 
+def current_user_type() -> Optional[str]:
+    """Get the user type value of the current user, or None if it can't be resolved.
+
+    Uses the user type claim of the access token if present, to avoid loading the user.
+    """
+    user_type = get_jwt_claims().get(USER_TYPE_CLAIM)
+    if user_type is None:
+        user = get_current_user()
+        if user is None:
+            return None
+        user_type = user.user_type
+    return getattr(user_type, "value", user_type)
+
+
+def statement_timeout(timeout_ms: int) -> Callable:
+    """Cancel any query running longer than `timeout_ms` milliseconds during this request.
+
+    Place it above `blp.response` so queries run during serialization are covered too.
+    Cancelled requests are aborted with 503.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            apply_statement_timeout(timeout_ms)
+            try:
+                return f(*args, **kwargs)
+            except OperationalError as ex:
+                if not is_query_canceled(ex):
+                    raise
+                abort_statement_timeout()
+
+        return decorated_function
+
+    return decorator
+
+
+def apply_statement_timeout(timeout_ms: Optional[int]) -> None:
+    """Set statement timeout for the current request, unless one has already been set."""
+    if not timeout_ms or request.environ.get("jetkit.statement_timeout_ms"):
+        return
+    request.environ["jetkit.statement_timeout_ms"] = timeout_ms
+    set_statement_timeout(Session, timeout_ms)
+
+
+def apply_list_statement_timeout() -> None:
+    apply_statement_timeout(
+        current_app.config.get(
+            "LIST_STATEMENT_TIMEOUT_MS", DEFAULT_LIST_STATEMENT_TIMEOUT_MS
+        )
+    )
+
+
+def abort_statement_timeout():
+    """Roll back the aborted transaction and respond with 503."""
+    Session.rollback()
+    timed_out_endpoints[request.endpoint] += 1
+    abort(503, message="Request took too long to complete, please try again later")
+
+
+def handle_statement_timeout(error: OperationalError):
+    """Map cancelled queries to 503 for endpoints not wrapped in `statement_timeout`.
+
+    Register with `app.register_error_handler(OperationalError, handle_statement_timeout)`.
+    """
+    if not is_query_canceled(error):
+        raise error
+    try:
+        abort_statement_timeout()
+    except HTTPException as ex:
+        return current_app.handle_http_exception(ex)
+
+
+def handle_version_conflict(error: StaleDataError):
+    """Respond with 409 when updating a `Versioned` row that was changed concurrently.
+
+    Register with `app.register_error_handler(StaleDataError, handle_version_conflict)`.
+    """
+    Session.rollback()
+    try:
+        abort(409, message="This was changed by someone else, reload it and try again")
+    except HTTPException as ex:
+        return current_app.handle_http_exception(ex)
+
+
 @unique
 class SortOrder(Enum):
     desc = "desc"
@@ -52,6 +157,7 @@ def sortable_by(*permitted_columns: Column) -> Callable:
     def decorator(request_handler):
         @wraps(request_handler)
         def wrapper(*args, **kwargs):
+            apply_list_statement_timeout()
             query = request_handler(*args, **kwargs)
 
             sort_field_name = request.args.get("sort_by")
@@ -97,6 +203,7 @@ def combined_search_by(
     def decorator(request_handler):
         @wraps(request_handler)
         def wrapper(*args, **kwargs):
+            apply_list_statement_timeout()
             query = request_handler(*args, **kwargs)
             search_query = request.args.get(search_parameter_name)
             if search_query is None:
@@ -129,6 +236,7 @@ def searchable_by(
     def decorator(request_handler):
         @wraps(request_handler)
         def wrapper(*args, **kwargs):
+            apply_list_statement_timeout()
             query = request_handler(*args, **kwargs)
             search_query = request.args.get(search_parameter_name)
 
@@ -1,23 +1,38 @@
+import logging
 from abc import abstractmethod
-from typing import List, Optional, Type, Union
+from typing import Callable, List, Optional, Tuple, Type, Union, TYPE_CHECKING
 
-from email_normalize import normalize
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
     get_current_user,
+    get_jwt_identity,
+    get_raw_jwt,
     jwt_refresh_token_required,
     jwt_required,
 )
 from flask_smorest import abort, Blueprint
 from marshmallow import fields as f, Schema
+from sqlalchemy import inspect
 from sqlalchemy.orm import Query
 
+from jetkit.api.rate_limit import by_email, by_ip, rate_limited
 from jetkit.api.user.schema import UserSchema
+from jetkit.model.user import normalize_email
+from jetkit.password import PasswordHasherBusyError
+
+if TYPE_CHECKING:
+    from jetkit.api.auth.revocation import RevocationStore
+
+log = logging.getLogger(__name__)
 
 blp = Blueprint("Authentication", __name__, url_prefix="/api/auth")
 
 
+# (requests, per seconds)
+RateLimit = Tuple[int, float]
+
+
 # default schemas
 class AuthRequest(Schema):
     password = f.String(required=True, allow_none=False)
@@ -32,6 +47,7 @@ class RefreshTokenResponse(Schema):
 class AuthModel:
     id: int
     email: str
+    normalized_email: str
     password: str
 
     # assuming for flask-sqlalchemy
@@ -41,6 +57,9 @@ class AuthModel:
     def is_correct_password(self, pw: str) -> bool:
         raise NotImplementedError()
 
+    def password_needs_rehash(self) -> bool:
+        return False
+
 
 def auth_response_for_user(user: AuthModel) -> dict:
     access_token = create_access_token(identity=user)
@@ -52,7 +71,30 @@ def auth_response_for_user(user: AuthModel) -> dict:
     }
 
 
-def use_core_auth_api(auth_model: AuthModel, user_schema: Type[Schema] = UserSchema):
+def rate_limits(
+        per_ip: Optional[RateLimit], per_email: Optional[RateLimit] = None
+) -> Callable:
+    """Apply rate limits by client IP and by the email in the request body, None to disable.
+
+    Limits by IP are off by default, as they need `ProxyFix` behind a proxy, see `by_ip`.
+    """
+
+    def decorator(request_handler):
+        if per_email:
+            request_handler = rate_limited(*per_email, key=by_email)(request_handler)
+        if per_ip:
+            request_handler = rate_limited(*per_ip, key=by_ip)(request_handler)
+        return request_handler
+
+    return decorator
+
+
+def use_core_auth_api(
+        auth_model: AuthModel,
+        user_schema: Type[Schema] = UserSchema,
+        login_rate_limit_per_ip: Optional[RateLimit] = None,
+        login_rate_limit_per_email: Optional[RateLimit] = (10, 300),
+):
     class AuthResponse(Schema):
         access_token = f.String(dump_only=True)
         refresh_token = f.String(dump_only=True)
@@ -61,18 +103,39 @@ def use_core_auth_api(auth_model: AuthModel, user_schema: Type[Schema] = UserSch
     @blp.route("login", methods=["POST"])
     @blp.response(AuthResponse)
     @blp.arguments(AuthRequest, as_kwargs=True)
+    @rate_limits(login_rate_limit_per_ip, login_rate_limit_per_email)
     def login(email: str, password: str):
         """Login with email + password."""
-        cleaned_email = email.strip().lower()
-        user: AuthModel = auth_model.query.filter_by(email=cleaned_email).one_or_none()
-        if not user or not user.password or not user.is_correct_password(password):
+        user: AuthModel = auth_model.query.filter_by(
+            normalized_email=normalize_email(email)
+        ).one_or_none()
+        try:
+            is_correct_password = (
+                user and user.password and user.is_correct_password(password)
+            )
+        except PasswordHasherBusyError:
+            abort(503, message="Too many login attempts, please try again later")
+        if not is_correct_password:
             abort(401, message="Wrong user name or password")
+
+        # upgrade hashes made with outdated method or cost now that we know the password
+        if hasattr(user, "password_needs_rehash") and user.password_needs_rehash():
+            try:
+                user.password = password
+                auth_model.query.session.commit()
+            except PasswordHasherBusyError:
+                # best effort, retried on the next login
+                log.info(f"Skipped rehashing password of user {user.id}, hasher is busy")
+
         return auth_response_for_user(user)
 
     @blp.route("check", methods=["GET"])
     @jwt_required
     def check_user():
         """Check if current access token is valid."""
+        # load the user even if it is loaded lazily, so tokens of deleted users are rejected
+        if not get_current_user():
+            abort(404)
         return "ok"
 
     @blp.route("refresh", methods=["POST"])
@@ -83,6 +146,24 @@ def use_core_auth_api(auth_model: AuthModel, user_schema: Type[Schema] = UserSch
         return {"access_token": create_access_token(identity=current_user)}
 
 
+def use_logout_api(revocation_store: "RevocationStore"):
+    @blp.route("logout", methods=["POST"])
+    @jwt_refresh_token_required
+    def logout():
+        """Revoke the refresh token sent with this request."""
+        revocation_store.revoke(get_raw_jwt())
+        revocation_store.session.commit()
+        return "ok"
+
+    @blp.route("logout-everywhere", methods=["POST"])
+    @jwt_required
+    def logout_everywhere():
+        """Revoke all access and refresh tokens of the current user."""
+        revocation_store.revoke_all(get_jwt_identity())
+        revocation_store.session.commit()
+        return "ok"
+
+
 def validate_email(
         email: str,
         allowed_domains: Optional[Union[str, List[str]]],
@@ -114,26 +195,52 @@ def use_sign_up_api(
         user_schema: Type[Schema] = UserSchema,
         allowed_domains: Optional[Union[str, List[str]]] = "*",
         allowed_emails: Optional[List] = None,
+        rate_limit_per_ip: Optional[RateLimit] = None,
 ):
     # Since sign up can require not only email/password, separate this from core auth api
     @blp.route("sign-up", methods=["POST"])
     @blp.response(user_schema)
     @blp.arguments(AuthRequest, as_kwargs=True)
+    @rate_limits(rate_limit_per_ip)
     def sign_up(email: str, password: str):
         """Sign up with email and password. Possibly add other fields later."""
-        cleaned_email = normalize(email.strip().lower())
-
         allowed = validate_email(email, allowed_domains, allowed_emails)
         if not allowed:
             abort(403, message="Domain or email is not allowed")
 
-        existing_user: AuthModel = auth_model.query.filter_by(
-            email=cleaned_email
-        ).one_or_none()
-        if existing_user:
-            abort(400, message="There's already a registered user with this email")
-        new_user = auth_model(email=email, password=password)  # type: ignore
+        # checked before hashing the password, so taken emails are rejected cheaply
         session = auth_model.query.session
-        session.add(new_user)
+        taken = session.query(
+            session.query(auth_model)
+            .filter_by(normalized_email=normalize_email(email))
+            .exists()
+        ).scalar()
+        if taken:
+            abort(400, message="There's already a registered user with this email")
+
+        try:
+            new_user = auth_model(email=email, password=password)  # type: ignore
+        except PasswordHasherBusyError:
+            abort(503, message="Too many sign ups, please try again later")
+
+        # single INSERT ... ON CONFLICT DO NOTHING RETURNING, safe against concurrent sign ups
+        new_user = auth_model.insert_or_ignore(  # type: ignore
+            index_elements=["normalized_email"], values=column_values(new_user)
+        )
+        if not new_user:
+            abort(400, message="There's already a registered user with this email")
         session.commit()
         return new_user
+
+
+def column_values(obj) -> dict:
+    """Get values of columns set on a model instance, by column name.
+
+    Unset and None values are left out, so column defaults apply.
+    """
+    state = inspect(obj)
+    return {
+        prop.columns[0].name: state.dict[prop.key]
+        for prop in state.mapper.column_attrs
+        if state.dict.get(prop.key) is not None
+    }
@@ -0,0 +1,145 @@
+"""Revoke JWTs before they expire.
+
+Revocations are stored in a table (see `jetkit.model.revoked_token.RevokedToken`),
+and every process keeps a Bloom filter of revoked token IDs and the "log out everywhere"
+times of users, rebuilt from the table every `refresh_interval` seconds.
+Checking a token that isn't revoked, the common case, needs no I/O.
+The table is only queried when the Bloom filter reports a possible match.
+
+Revocations made by other processes take effect once the next rebuild happens.
+Revoking all tokens of a user also revokes tokens issued later during the same second.
+
+::
+
+    jwt = JWTManager(app)
+    revocation_store = use_token_revocation(app, RevokedToken)
+    use_logout_api(revocation_store)
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Type
+
+from flask import Flask, current_app
+from sqlalchemy import func
+
+from jetkit.bloom import BloomFilter
+from jetkit.model.revoked_token import RevokedToken
+
+
+class RevocationStore:
+    def __init__(
+        self,
+        model: Type[RevokedToken],
+        refresh_interval: float = 60,
+        error_rate: float = 0.001,
+    ):
+        self.model = model
+        self.refresh_interval = refresh_interval
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(1, error_rate=error_rate)
+        # identity -> timestamp, tokens issued up to then are revoked
+        self._cutoffs: Dict[str, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # how many checks needed a DB query
+        self.db_checks = 0
+
+    def init_app(self, app: Flask) -> None:
+        """Check access and refresh tokens of `app` against this store."""
+        app.config["JWT_BLACKLIST_ENABLED"] = True
+        app.extensions["flask-jwt-extended"].token_in_blacklist_loader(self.is_revoked)
+
+    @property
+    def session(self):
+        return self.model.query.session  # type: ignore
+
+    def is_revoked(self, decoded_token: dict) -> bool:
+        self.refresh_if_stale()
+
+        identity = decoded_token.get(current_app.config["JWT_IDENTITY_CLAIM"])
+        cutoff = self._cutoffs.get(str(identity))
+        if cutoff is not None and decoded_token.get("iat", 0) <= cutoff:
+            return True
+
+        jti = decoded_token.get("jti")
+        if jti is None or jti not in self._bloom:
+            return False
+
+        self.db_checks += 1
+        return self.session.query(
+            self.model.unexpired().filter_by(jti=jti).exists()
+        ).scalar()
+
+    def revoke(self, decoded_token: dict) -> None:
+        """Revoke one token. Commit the session afterwards."""
+        jti = decoded_token["jti"]
+        identity = decoded_token[current_app.config["JWT_IDENTITY_CLAIM"]]
+        exp = decoded_token.get("exp")
+        self.session.add(
+            self.model(  # type: ignore
+                jti=jti,
+                identity=str(identity),
+                revoked_at=datetime.now(timezone.utc),
+                expires_at=datetime.fromtimestamp(exp, timezone.utc) if exp else None,
+            )
+        )
+        self._bloom.add(jti)
+
+    def revoke_all(self, identity) -> None:
+        """Revoke all tokens issued to `identity` until now. Commit the session afterwards."""
+        now = datetime.now(timezone.utc)
+        # tokens issued until now are valid for the refresh token lifetime at most
+        refresh_expires = current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+        self.session.add(
+            self.model(  # type: ignore
+                identity=str(identity),
+                revoked_at=now,
+                expires_at=(
+                    now + refresh_expires
+                    if isinstance(refresh_expires, timedelta)
+                    else None
+                ),
+            )
+        )
+        self._cutoffs[str(identity)] = now.timestamp()
+
+    def refresh_if_stale(self) -> None:
+        loaded_at = self._loaded_at
+        age = time.monotonic() - loaded_at if loaded_at is not None else None
+        if age is not None and age < self.refresh_interval:
+            return
+        # one request rebuilds, others keep using the current filter meanwhile
+        if not self._lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            self.refresh()
+        finally:
+            self._lock.release()
+
+    def refresh(self) -> None:
+        """Rebuild the Bloom filter and cutoffs from the table."""
+        model = self.model
+        unexpired = model.unexpired()
+        jtis = unexpired.filter(model.jti.isnot(None)).with_entities(model.jti)
+        cutoffs = (
+            unexpired.filter(model.jti.is_(None))
+            .with_entities(model.identity, func.max(model.revoked_at))
+            .group_by(model.identity)
+        )
+        self._bloom = BloomFilter.from_items(
+            (jti for jti, in jtis), error_rate=self.error_rate
+        )
+        self._cutoffs = {
+            identity: revoked_at.timestamp() for identity, revoked_at in cutoffs
+        }
+        self._loaded_at = time.monotonic()
+
+
+def use_token_revocation(
+    app: Flask, model: Type[RevokedToken], refresh_interval: float = 60
+) -> RevocationStore:
+    """Check access and refresh tokens of `app` against revocations stored in `model`."""
+    store = RevocationStore(model, refresh_interval=refresh_interval)
+    store.init_app(app)
+    return store
@@ -0,0 +1,81 @@
+"""Skip signature verification for access tokens that were already verified.
+
+A client sends the same access token on every request until it expires,
+and `jwt_required` decodes and verifies its signature each time.
+Verification is cheap with HS256 but not with asymmetric algorithms like RS256.
+
+`use_verified_token_cache` keeps decoded tokens in an in-process LRU cache,
+keyed by a digest of the token and expiring at the token's `exp` claim.
+Revocation checks (`token_in_blacklist_loader`) still run on every request.
+
+::
+
+    jwt = JWTManager(app)
+    token_cache = use_verified_token_cache(app)
+    ...
+    token_cache.stats.hit_rate
+"""
+import hashlib
+import time
+from typing import Optional
+
+import flask_jwt_extended.view_decorators
+from flask import Flask, current_app
+from flask_jwt_extended.utils import decode_token
+
+from jetkit.cache import CacheStats, LRUCache
+
+EXTENSION_KEY = "jetkit_verified_token_cache"
+DEFAULT_MAXSIZE = 4096
+
+
+class VerifiedTokenCache:
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.cache = LRUCache(maxsize=maxsize)
+
+    @property
+    def stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def decode(self, encoded_token: str, csrf_value: Optional[str] = None) -> dict:
+        """Decode and verify a token, or get it from the cache if it was verified before."""
+        key = token_digest(encoded_token, csrf_value)
+        decoded = self.cache.get(key)
+        if decoded is not None:
+            if decoded.get("exp", 0) > time.time():
+                return dict(decoded)
+            self.cache.delete(key)
+
+        decoded = decode_token(encoded_token, csrf_value)
+        # tokens without an expiry aren't cached, they can't be bounded
+        ttl = decoded.get("exp", 0) - time.time()
+        if ttl > 0:
+            self.cache.set(key, decoded, ttl=ttl)
+        return dict(decoded)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+def token_digest(encoded_token: str, csrf_value: Optional[str] = None) -> str:
+    return hashlib.sha256(f"{encoded_token}:{csrf_value}".encode()).hexdigest()
+
+
+def use_verified_token_cache(
+    app: Flask, maxsize: int = DEFAULT_MAXSIZE
+) -> VerifiedTokenCache:
+    """Cache verified access tokens for `app`."""
+    token_cache = VerifiedTokenCache(maxsize=maxsize)
+    app.extensions[EXTENSION_KEY] = token_cache
+    # flask-jwt-extended has no hook for decoding, so swap the function jwt_required calls
+    flask_jwt_extended.view_decorators.decode_token = _decode_token
+    return token_cache
+
+
+def _decode_token(encoded_token, csrf_value=None, allow_expired=False):
+    token_cache: Optional[VerifiedTokenCache] = current_app.extensions.get(
+        EXTENSION_KEY
+    )
+    if token_cache is None or allow_expired:
+        return decode_token(encoded_token, csrf_value, allow_expired)
+    return token_cache.decode(encoded_token, csrf_value)
@@ -0,0 +1,125 @@
+"""Load the current user for JWT-protected endpoints without querying the DB on every request.
+
+Access tokens carry the user's type and extid as claims, so `permissions_required`
+can check them without loading the user.
+Loaded users are kept in a short-lived in-process cache, which is invalidated when the user is
+updated or deleted through this process. Other processes keep using their cached copy for up to
+`ttl` seconds, so a deleted or demoted user may still be served by them until then.
+With `lazy=True`, the user is only loaded once `current_user` is actually used,
+so endpoints that don't use it accept tokens of deleted users too.
+
+::
+
+    jwt = JWTManager(app)
+    use_jwt_user_loader(jwt, User)
+"""
+import pickle
+from typing import Any, Optional, Type
+
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.exceptions import UserLoadError
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm.util import identity_key
+from werkzeug.local import LocalProxy
+
+from jetkit.api import EXTID_CLAIM, USER_TYPE_CLAIM
+from jetkit.cache import LRUCache
+
+
+class CachedUserLoader:
+    """Load users by primary key, caching them for `ttl` seconds.
+
+    Users are cached pickled, and merged into the current session without a query on cache hits.
+    """
+
+    def __init__(self, user_model: Type, ttl: float = 30, maxsize: int = 1024):
+        self.user_model = user_model
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+        # drop cached users when they change
+        event.listen(
+            user_model, "after_update", self._invalidate_target, propagate=True
+        )
+        event.listen(
+            user_model, "after_delete", self._invalidate_target, propagate=True
+        )
+
+    def load(self, identity: Any) -> Optional[Any]:
+        session = self.user_model.query.session
+        cached = self.cache.get(identity)
+        # merging would overwrite changes to a copy already in the session,
+        # which get() returns without a query
+        in_session = identity_key(self.user_model, identity) in session.identity_map
+        if cached is not None and not in_session:
+            try:
+                return session.merge(pickle.loads(cached), load=False)
+            except InvalidRequestError:
+                pass
+
+        user = self.user_model.query.get(identity)
+        # don't cache unsaved changes
+        if user is not None and not in_session:
+            self.cache.set(identity, pickle.dumps(user))
+        return user
+
+    def lazy_load(self, identity: Any) -> LocalProxy:
+        """Get a proxy that loads the user the first time it is used.
+
+        Raises `UserLoadError` when used if the user doesn't exist.
+        """
+        user = None
+
+        def load():
+            nonlocal user
+            if user is None:
+                user = self.load(identity)
+                if user is None:
+                    raise UserLoadError(f"User {identity} not found")
+            return user
+
+        return LocalProxy(load)
+
+    def invalidate(self, identity: Any) -> None:
+        self.cache.delete(identity)
+
+    def _invalidate_target(self, mapper, connection, target):
+        self.invalidate(target.id)
+
+
+def user_claims(user) -> dict:
+    """Claims to embed in access tokens."""
+    user_type = user.user_type
+    return {
+        USER_TYPE_CLAIM: getattr(user_type, "value", user_type),
+        EXTID_CLAIM: str(user.extid) if user.extid else None,
+    }
+
+
+def use_jwt_user_loader(
+    jwt: JWTManager, user_model: Type, ttl: float = 30, lazy: bool = False
+) -> CachedUserLoader:
+    """Register identity, claims and user loaders for `user_model` with `jwt`.
+
+    If `lazy`, `jwt_required` doesn't load the user until `current_user` is accessed.
+    """
+    loader = CachedUserLoader(user_model, ttl=ttl)
+
+    @jwt.user_identity_loader
+    def user_identity_lookup(user):
+        assert user.id
+        return user.id
+
+    @jwt.user_claims_loader
+    def add_user_claims(user):
+        return user_claims(user)
+
+    @jwt.user_loader_callback_loader
+    def user_loader_callback(identity):
+        if identity is None:
+            return None
+        if lazy:
+            return loader.lazy_load(identity)
+        return loader.load(identity)
+
+    return loader
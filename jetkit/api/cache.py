@@ -0,0 +1,152 @@
+"""Cache responses of list endpoints until the underlying tables change.
+
+Every cached table has a version counter in the cache backend, incremented after
+any commit that inserted, updated or deleted its rows through the ORM.
+Versions are part of the cache key, so bumping one invalidates all responses built from that table.
+
+Writes made without the ORM (e.g. `session.execute(insert(...))` or upserts) aren't detected,
+call `invalidate(Model)` after committing those, or `jetkit.db.utils.mark_tables_changed` before.
+
+With the default in-process `LRUCache` each process only sees its own commits,
+use a shared `CacheBackend` if several processes write to the same tables.
+"""
+import hashlib
+from collections import defaultdict
+from functools import wraps
+from typing import Callable, DefaultDict, Iterable, Optional, Set
+
+from flask import make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request_optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_mapper
+
+from jetkit.cache import CacheBackend, CacheStats, LRUCache
+from jetkit.db.utils import CHANGED_TABLES_KEY, mark_tables_changed
+
+default_backend: CacheBackend = LRUCache(maxsize=1024)
+
+# hits and misses for each endpoint
+endpoint_stats: DefaultDict[str, CacheStats] = defaultdict(CacheStats)
+
+# backends and tables that need version bumps on commit
+_watched: DefaultDict[str, Set[CacheBackend]] = defaultdict(set)
+
+SESSION_INFO_KEY = CHANGED_TABLES_KEY
+
+
+def cached_response(
+    *models,
+    ttl: Optional[float] = 300,
+    backend: CacheBackend = None,
+    vary_on_user: bool = True,
+) -> Callable:
+    """Cache GET responses until rows of any of `models` change or `ttl` seconds pass.
+
+    Responses are keyed on the endpoint, query arguments and (if `vary_on_user`) the JWT identity.
+    Place above `blp.response` and below `jwt_required` or `permissions_required`,
+    cache hits skip decorators below it:
+
+    ::
+
+        @blp.route("")
+        @permissions_required([UserType.admin])
+        @cached_response(User)
+        @blp.response(UserSchema(many=True))
+        @sortable_by(User.name)
+        def get_list():
+            return User.query
+    """
+    backend = backend or default_backend
+    tables = sorted(table_names(models))
+    for table in tables:
+        _watched[table].add(backend)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+
+            stats = endpoint_stats[request.endpoint]
+            key = response_cache_key(backend, tables, vary_on_user)
+            cached = backend.get(key)
+            if cached is not None:
+                stats.hits += 1
+                body, status, headers = cached
+                return make_response((body, status, headers))
+
+            stats.misses += 1
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                backend.set(
+                    key,
+                    (response.get_data(), response.status_code, list(response.headers)),
+                    ttl=ttl,
+                )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def response_cache_key(
+    backend: CacheBackend, tables: Iterable[str], vary_on_user: bool
+) -> str:
+    identity = None
+    if vary_on_user:
+        verify_jwt_in_request_optional()
+        identity = get_jwt_identity()
+    parts = (
+        request.endpoint,
+        sorted(request.view_args.items()) if request.view_args else None,
+        sorted(request.args.items(multi=True)),
+        identity,
+        [(table, backend.get_version(table)) for table in tables],
+    )
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def table_names(models) -> Set[str]:
+    """Get names of all tables models are stored in, including inherited ones."""
+    return {table.name for model in models for table in model.__mapper__.tables}
+
+
+def invalidate(*models) -> None:
+    """Invalidate cached responses that depend on `models`."""
+    bump_versions(table_names(models))
+
+
+def bump_versions(tables: Iterable[str]) -> None:
+    for table in tables:
+        for backend in _watched.get(table, ()):
+            backend.incr_version(table)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_tables(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        mark_tables_changed(
+            session, *(table.name for table in object_mapper(obj).tables)
+        )
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _record_bulk_tables(update_context):
+    session = update_context.session
+    mark_tables_changed(
+        session, *(table.name for table in update_context.mapper.tables)
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session):
+    bump_versions(session.info.pop(SESSION_INFO_KEY, ()))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_rolled_back_tables(session, transaction):
+    # rolled back changes are left out of the next commit, savepoints keep the outer changes
+    if transaction.parent is None:
+        session.info.pop(SESSION_INFO_KEY, None)
@@ -0,0 +1,144 @@
+"""Conditional request support for model endpoints.
+
+ETags and Last-Modified are derived from `BaseModel.updated_at`/`created_at`
+instead of hashing the serialized response, so a `304 Not Modified` can be returned
+without serializing anything, and for collections without running the main query.
+
+`Versioned` models use their version as a strong ETag instead,
+so the ETag of a GET can be sent back in If-Match to update the model, see `check_if_match`.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from flask import Response, after_this_request, request
+from flask_smorest import abort
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import func
+from werkzeug.http import http_date, quote_etag
+
+from jetkit.api import append_docs
+from jetkit.db.model import BaseModel
+from jetkit.db.versioned import Versioned
+
+
+def model_etag(obj: BaseModel) -> str:
+    """Compute an ETag for a single model instance."""
+    if isinstance(obj, Versioned):
+        return obj.etag
+    return _digest(type(obj).__name__, obj.id, obj.updated_at or obj.created_at)
+
+
+def collection_etag(query) -> Tuple[str, Optional[datetime]]:
+    """Compute an ETag and last modified time for the results of a query.
+
+    Runs one aggregate query instead of the query itself.
+    Includes the request arguments and current user in the ETag,
+    since they determine the contents of the response.
+    """
+    entity = query.column_descriptions[0]["entity"]
+    last_modified, count = (
+        query.with_entities(
+            func.max(func.coalesce(entity.updated_at, entity.created_at)), func.count()
+        )
+        .order_by(None)
+        .one()
+    )
+    etag = _digest(
+        request.endpoint,
+        sorted(request.view_args.items()) if request.view_args else None,
+        sorted(request.args.items(multi=True)),
+        get_jwt_identity(),
+        last_modified,
+        count,
+    )
+    return etag, last_modified
+
+
+def conditional_model(request_handler: Callable) -> Callable:
+    """Respond with `304 Not Modified` if the client has the current version of the returned model.
+
+    Place between `blp.response` and the handler, which needs to return a `BaseModel`.
+    """
+
+    @wraps(request_handler)
+    def wrapper(*args, **kwargs):
+        obj = request_handler(*args, **kwargs)
+        if not isinstance(obj, BaseModel):
+            return obj
+        return conditional_result(
+            obj,
+            model_etag(obj),
+            obj.updated_at or obj.created_at,
+            weak=not isinstance(obj, Versioned),
+        )
+
+    return wrapper
+
+
+def conditional_collection(request_handler: Callable) -> Callable:
+    """Respond with `304 Not Modified` if the client has the current version of the returned query results.
+
+    Place between `blp.response` and the handler, above `sortable_by` and friends.
+    """
+
+    @wraps(request_handler)
+    def wrapper(*args, **kwargs):
+        query = request_handler(*args, **kwargs)
+        etag, last_modified = collection_etag(query)
+        return conditional_result(query, etag, last_modified)
+
+    append_docs(wrapper, "Supports conditional requests with `If-None-Match`.")
+
+    return wrapper
+
+
+def conditional_result(
+    result, etag: str, last_modified: Optional[datetime], weak: bool = True
+):
+    """Return `result` with caching headers, or a 304 response if the client is up to date."""
+    headers = {"ETag": quote_etag(etag, weak=weak)}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    if is_not_modified(etag, last_modified):
+        return Response(status=304, headers=headers)
+    return result, headers
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since and last_modified:
+        if if_modified_since.tzinfo is None:
+            if_modified_since = if_modified_since.replace(tzinfo=timezone.utc)
+        # HTTP dates have a resolution of one second
+        return last_modified.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def check_if_match(obj: Versioned) -> None:
+    """Respond with 412 if the request has an If-Match header not matching the version of `obj`.
+
+    Also sets the ETag of the response to the version of `obj` after the request.
+    Send the ETag of a response back in If-Match to update only if nobody else did in the meantime.
+    """
+    if request.if_match and obj.etag not in request.if_match:
+        abort(412, message="This was changed by someone else, reload it and try again")
+    set_etag(obj)
+
+
+def set_etag(obj: Versioned) -> None:
+    """Set the ETag of the response to the version of `obj`, once the request is done."""
+
+    @after_this_request
+    def add_etag(response):
+        response.set_etag(obj.etag)
+        return response
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
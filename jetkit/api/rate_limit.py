@@ -0,0 +1,234 @@
+"""Throttle requests with sliding window counters.
+
+Each limit counts requests in fixed windows of `per` seconds, and weighs the previous window's count
+by how much of it still overlaps the sliding window ending now.
+Rejected requests get `429 Too Many Requests` with a `Retry-After` header
+before the view runs, so they cost no DB or password hashing work.
+
+::
+
+    @blp.route("login", methods=["POST"])
+    @blp.arguments(AuthRequest, as_kwargs=True)
+    @rate_limited(20, per=60, key=by_ip)
+    @rate_limited(5, per=300, key=by_email)
+    def login(email, password):
+        ...
+
+Counters are kept in process memory by default.
+To share them between processes, configure a shared backend:
+
+::
+
+    use_rate_limit_backend(app, PostgresRateLimitBackend(RateLimit))
+"""
+import itertools
+import math
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from flask import Flask, current_app, request
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from werkzeug.exceptions import TooManyRequests
+
+from jetkit.api import append_docs
+from jetkit.db.rate_limit import RateLimitCounter
+from jetkit.model.user import normalize_email
+
+EXTENSION_KEY = "jetkit_rate_limit_backend"
+
+KeyFunction = Callable[[], Optional[str]]
+
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    def hit(self, key: str, limit: int, per: float) -> Optional[float]:
+        """Count a request for `key` if it is within `limit` requests per `per` seconds.
+
+        :returns: None if allowed, otherwise seconds until a request would be allowed.
+        """
+        raise NotImplementedError()
+
+
+class InProcessRateLimitBackend(RateLimitBackend):
+    """Counters in process memory.
+
+    Doesn't take locks: windows are lists that are only appended to, and dict and list
+    operations are atomic, so concurrent requests can at worst overshoot a limit slightly.
+    """
+
+    sweep_every = 1000
+
+    def __init__(self):
+        # (key, window length, window) -> one element per allowed request
+        self._windows: Dict[Tuple[str, float, int], List[None]] = {}
+        self._hits = itertools.count(1)
+
+    def hit(self, key: str, limit: int, per: float) -> Optional[float]:
+        now = time.time()
+        window = int(now // per)
+        current = self._windows.setdefault((key, per, window), [])
+        previous = len(self._windows.get((key, per, window - 1), ()))
+
+        retry_after = retry_after_seconds(now, per, limit, previous, len(current))
+        if retry_after is None:
+            current.append(None)
+
+        if next(self._hits) % self.sweep_every == 0:
+            self.sweep(now)
+        return retry_after
+
+    def sweep(self, now: Optional[float] = None) -> None:
+        """Drop windows that can't affect limits anymore."""
+        now = now or time.time()
+        for key, per, window in list(self._windows):
+            if window < now // per - 1:
+                self._windows.pop((key, per, window), None)
+
+    def clear(self) -> None:
+        self._windows.clear()
+
+
+class PostgresRateLimitBackend(RateLimitBackend):
+    """Counters in a table, shared between all processes using the DB.
+
+    Counters are updated in their own transactions, so they count even if the request is rolled back.
+    Call `counter_model.delete_expired()` periodically to remove old counters.
+    """
+
+    def __init__(self, counter_model: Type[RateLimitCounter]):
+        self.counter_model = counter_model
+
+    def hit(self, key: str, limit: int, per: float) -> Optional[float]:
+        model = self.counter_model
+        table = model.__table__  # type: ignore
+        now = time.time()
+        window = int(now // per)
+
+        bind = model.query.session.get_bind()  # type: ignore
+        with bind.begin() as conn:
+            counts = dict(
+                conn.execute(
+                    table.select()
+                    .with_only_columns([table.c.window, table.c.count])
+                    .where(table.c.key == key)
+                    .where(table.c.window.in_([window - 1, window]))
+                ).fetchall()
+            )
+            previous, current = counts.get(window - 1, 0), counts.get(window, 0)
+            retry_after = retry_after_seconds(now, per, limit, previous, current)
+            if retry_after is not None:
+                return retry_after
+
+            # only count if a concurrent request didn't use up the limit in the meantime
+            remaining = limit - previous * previous_window_weight(now, per)
+            expires_at = datetime.fromtimestamp((window + 2) * per, timezone.utc)
+            insert_query = pg_insert(table).values(
+                key=key, window=window, count=1, expires_at=expires_at
+            )
+            insert_query = insert_query.on_conflict_do_update(
+                index_elements=["key", "window"],
+                set_={"count": table.c.count + 1},
+                where=table.c.count + 1 <= remaining,
+            ).returning(table.c.count)
+            counted = conn.execute(insert_query).scalar()
+
+        if counted is None:
+            return retry_after_seconds(now, per, limit, previous, math.floor(remaining))
+        return None
+
+
+def previous_window_weight(now: float, per: float) -> float:
+    """Fraction of the previous window still inside the sliding window ending at `now`."""
+    return 1 - (now % per) / per
+
+
+def retry_after_seconds(
+    now: float, per: float, limit: int, previous: int, current: int
+) -> Optional[float]:
+    """Get seconds until another request is allowed, or None if one is allowed now.
+
+    `previous` and `current` are the counts of the previous and current windows.
+    """
+    if limit <= 0:
+        # nothing is ever allowed
+        return per
+    if previous * previous_window_weight(now, per) + current + 1 <= limit:
+        return None
+
+    window_end = (now // per + 1) * per
+    if current + 1 > limit:
+        # wait for the next window, where the current count becomes the previous one
+        return window_end + per * (1 - (limit - 1) / current) - now
+    # wait until enough of the previous window has slid out
+    return window_end - per * (limit - 1 - current) / previous - now
+
+
+def by_ip() -> Optional[str]:
+    """Key on the client address.
+
+    Behind a load balancer or other proxy, apply `werkzeug.middleware.proxy_fix.ProxyFix`
+    so this is the client's address, otherwise all clients share the proxy's limit.
+    """
+    return request.remote_addr
+
+
+def by_email() -> Optional[str]:
+    """Key on the mailbox in the `email` field of a JSON request body."""
+    body = request.get_json(silent=True)
+    email = body.get("email") if isinstance(body, dict) else None
+    if not isinstance(email, str) or "@" not in email:
+        return None
+    return normalize_email(email)
+
+
+def too_many_requests(retry_after: float) -> TooManyRequests:
+    seconds = max(math.ceil(retry_after), 1)
+    error = TooManyRequests(retry_after=seconds)
+    # for flask-smorest's error handler
+    error.data = {
+        "message": "Too many requests, please try again later",
+        "headers": {"Retry-After": str(seconds)},
+    }
+    return error
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    backend = current_app.extensions.get(EXTENSION_KEY)
+    if backend is None:
+        backend = InProcessRateLimitBackend()
+        current_app.extensions[EXTENSION_KEY] = backend
+    return backend
+
+
+def use_rate_limit_backend(app: Flask, backend: RateLimitBackend) -> None:
+    app.extensions[EXTENSION_KEY] = backend
+
+
+def rate_limited(limit: int, per: float = 60, key: KeyFunction = by_ip) -> Callable:
+    """Allow at most `limit` requests per `per` seconds for each value returned by `key`.
+
+    Requests for which `key` returns None aren't limited.
+    Limits are separate for each endpoint.
+    """
+
+    def decorator(request_handler):
+        @wraps(request_handler)
+        def wrapper(*args, **kwargs):
+            value = key()
+            if value is not None:
+                backend = get_rate_limit_backend()
+                counter_key = f"{request.endpoint}:{key.__name__}:{value}"
+                retry_after = backend.hit(counter_key, limit, per)
+                if retry_after is not None:
+                    raise too_many_requests(retry_after)
+            return request_handler(*args, **kwargs)
+
+        append_docs(
+            wrapper, f"Limited to {limit} requests per {timedelta(seconds=per)}."
+        )
+        return wrapper
+
+    return decorator
@@ -0,0 +1,216 @@
+"""Fast-path serialization for marshmallow schemas.
+
+`Schema.dump` looks up every field's accessor, format and options for every row.
+`compile_schema` does that work once per schema and returns a specialized dump function.
+
+Opt in for an endpoint by passing a compiled schema to `blp.response`:
+
+::
+
+    @blp.response(compiled(UserSchema)(many=True))
+
+Output is identical to `Schema.dump`. Schemas with hooks (`pre_dump`, `post_dump`)
+or a custom `get_attribute` are dumped the normal way.
+"""
+import datetime
+from collections.abc import Mapping
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Type
+
+from flask.json import JSONEncoder as FlaskJSONEncoder
+from marshmallow import Schema, fields as f, missing
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+from marshmallow.utils import ensure_text_type
+from marshmallow_enum import EnumField, LoadDumpOptions
+
+try:
+    import orjson
+except ImportError:  # optional, speeds up JSONEncoder
+    orjson = None  # type: ignore
+
+DumpFunction = Callable[..., Any]
+
+ISO_FORMATS = ("iso", "iso8601")
+
+
+def is_compilable(schema: Schema) -> bool:
+    """Check that `schema` doesn't customize dumping in ways we can't reproduce."""
+    has_hooks = schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP)
+    custom_accessor = type(schema).get_attribute is not Schema.get_attribute
+    return not has_hooks and not custom_accessor
+
+
+def compile_schema(schema: Schema) -> DumpFunction:
+    """Build a function that dumps objects exactly like `schema.dump`."""
+    if not is_compilable(schema):
+        return schema.dump
+
+    # generated code refers to converters, defaults and fallback fields by name
+    namespace: Dict[str, Any] = dict(
+        missing=missing,
+        dict_class=schema.dict_class,
+        get_attribute=schema.get_attribute,
+    )
+    object_lines = []
+    mapping_lines = []
+    for i, (attr_name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else attr_name
+        attribute = field.attribute or attr_name
+        converter = converter_for_field(field)
+
+        if converter is None or "." in attribute:
+            # fields that we don't know how to speed up are serialized by marshmallow
+            namespace[f"field_{i}"] = field
+            line = f"value = field_{i}.serialize({attr_name!r}, obj, accessor=get_attribute)"
+            lines = [line, "if value is not missing:", f"    ret[{key!r}] = value"]
+            object_lines.extend(lines)
+            mapping_lines.extend(lines)
+            continue
+
+        namespace[f"convert_{i}"] = converter
+        store = f"ret[{key!r}] = None if value is None else convert_{i}(value)"
+        default = getattr(field, "default", missing)
+        if default is missing:
+            on_missing = ["pass"]
+        else:
+            namespace[f"default_{i}"] = default
+            call = "()" if callable(default) else ""
+            on_missing = [f"value = default_{i}{call}", store]
+        for lines, get in (
+            (object_lines, f"getattr(obj, {attribute!r}, missing)"),
+            (mapping_lines, f"obj.get({attribute!r}, missing)"),
+        ):
+            lines.append(f"value = {get}")
+            lines.append("if value is not missing:")
+            lines.append(f"    {store}")
+            lines.append("else:")
+            lines.extend(f"    {line}" for line in on_missing)
+
+    source = "\n".join(
+        [
+            "def dump_object(obj):",
+            "    ret = dict_class()",
+            *(f"    {line}" for line in object_lines),
+            "    return ret",
+            "def dump_mapping(obj):",
+            "    ret = dict_class()",
+            *(f"    {line}" for line in mapping_lines),
+            "    return ret",
+        ]
+    )
+    exec(compile(source, f"<compiled {type(schema).__name__}>", "exec"), namespace)
+    dump_object = namespace["dump_object"]
+    dump_mapping = namespace["dump_mapping"]
+
+    # remember which dump function to use for each type of object
+    dump_for_type: Dict[type, Callable[[Any], dict]] = {dict: dump_mapping}
+
+    def dump_one(obj) -> dict:
+        obj_type = type(obj)
+        dump_fn = dump_for_type.get(obj_type)
+        if dump_fn is None:
+            dump_fn = dump_mapping if isinstance(obj, Mapping) else dump_object
+            dump_for_type[obj_type] = dump_fn
+        return dump_fn(obj)
+
+    def dump(obj, *, many: Optional[bool] = None):
+        many = schema.many if many is None else bool(many)
+        if many and obj is not None:
+            return [dump_one(o) for o in obj]
+        return dump_one(obj)
+
+    return dump
+
+
+def converter_for_field(field: f.Field) -> Optional[Callable[[Any], Any]]:
+    """Get a function converting a non-null attribute value to its serialized form.
+
+    Returns None if the field needs to be serialized by marshmallow.
+    """
+    # check subclasses before their bases
+    if isinstance(field, f.UUID):
+        return lambda value: str(field._validated(value))
+    if isinstance(field, f.String):
+        return ensure_text_type
+    if isinstance(field, f.Date):
+        if (field.format or field.DEFAULT_FORMAT) in ISO_FORMATS:
+            return datetime.date.isoformat
+        return None
+    if isinstance(field, f.DateTime):
+        if (field.format or field.DEFAULT_FORMAT) in ISO_FORMATS:
+            return datetime.datetime.isoformat
+        return None
+    if isinstance(field, EnumField):
+        if field.dump_by == LoadDumpOptions.value:
+            return lambda value: value.value
+        return lambda value: value.name
+    if isinstance(field, f.Boolean):
+        return lambda value: field._serialize(value, attr=None, obj=None)
+    if type(field) is f.Integer and not field.as_string:
+        return int
+    if isinstance(field, f.Pluck):
+        return None
+    if isinstance(field, f.Nested) and isinstance(field.nested, (type, Schema)):
+        nested_dump = compile_schema(field.schema)
+        many = field.many or field.schema.many
+        return lambda value: nested_dump(value, many=many)
+    if type(field) is f.Raw:
+        return identity
+    if type(field) is f.Dict and field.key_field is None and field.value_field is None:
+        return identity
+    return None
+
+
+def identity(value):
+    return value
+
+
+def compiled(schema_cls: Type[Schema]) -> Type[Schema]:
+    """Make a subclass of `schema_cls` that dumps using a compiled dump function.
+
+    Can be used as a class decorator as well.
+    """
+
+    class CompiledSchema(schema_cls):  # type: ignore
+        _compiled_dump: Optional[DumpFunction] = None
+
+        def dump(self, obj, *, many: Optional[bool] = None):
+            if self._compiled_dump is None:
+                if is_compilable(self):
+                    self._compiled_dump = compile_schema(self)
+                else:
+                    self._compiled_dump = super().dump
+            return self._compiled_dump(obj, many=many)
+
+    CompiledSchema.__name__ = schema_cls.__name__
+    CompiledSchema.__qualname__ = schema_cls.__qualname__
+    CompiledSchema.__module__ = schema_cls.__module__
+    CompiledSchema.__doc__ = schema_cls.__doc__
+    return CompiledSchema
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Flask JSON encoder that uses `orjson` when it is installed.
+
+    Set `app.json_encoder = JSONEncoder`.
+    Falls back to the standard encoder for options `orjson` doesn't support.
+    """
+
+    def default(self, o):
+        if isinstance(o, Enum):
+            return o.value
+        return super().default(o)
+
+    def encode(self, o) -> str:
+        if orjson is None or self.indent not in (None, 2):
+            return super().encode(o)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent == 2:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(o, default=self.default, option=option).decode()
+        except TypeError:
+            # e.g. non-str dict keys or integers larger than 64 bits
+            return super().encode(o)
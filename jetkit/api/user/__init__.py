@@ -1,5 +1,6 @@
 from flask_jwt_extended import jwt_required
 from flask_smorest import Blueprint
+from jetkit.api.etag import conditional_collection, conditional_model
 from jetkit.model.user import CoreUser as User
 from marshmallow import Schema
 from .schema import UserSchema
@@ -11,6 +12,7 @@ blp = Blueprint("Users", __name__, url_prefix="/api/user")
 def use_core_user_api(user_model: User, user_schema: Type[Schema] = UserSchema):
     @blp.route("")
     @blp.response(user_schema(many=True))
+    @conditional_collection
     # TODO: protect with @permissions_required
     def get_list():
         """List users."""
@@ -19,6 +21,7 @@ def use_core_user_api(user_model: User, user_schema: Type[Schema] = UserSchema):
     @blp.route("<int:user_id>", methods=["GET"])
     @blp.response(user_schema)
     @jwt_required
+    @conditional_model
     def get_user(user_id: int) -> User:
         """Get user details."""
         user = user_model.query.get_or_404(user_id)
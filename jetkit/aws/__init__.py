@@ -2,9 +2,10 @@
 
 Automatically includes access key and other configuration settings from our Flask config.
 """
-import boto3
 import os
 
+from jetkit.aws.wsgi import LambdaHandler, lambda_handler
+
 
 def is_in_aws() -> bool:
     """Check if we're running in AWS.
@@ -20,5 +21,10 @@ def is_in_aws() -> bool:
 
 def get_session():
     """Get boto3 session."""
+    import boto3
+
     session = boto3.session.Session()
     return session
+
+
+__all__ = ("LambdaHandler", "get_session", "is_in_aws", "lambda_handler")
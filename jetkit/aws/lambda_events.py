@@ -0,0 +1,134 @@
+"""Build and replay Lambda events locally, to test handlers without deploying.
+
+::
+
+    handler = lambda_handler(create_app)
+    response = handler(http_api_event("GET", "/api/user/me", headers={"Authorization": f"Bearer {token}"}))
+
+    # events captured from CloudWatch logs, one event or a list of events per file
+    responses = replay(handler, "events/upload.json")
+"""
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Union
+from urllib.parse import urlencode
+
+
+@dataclass
+class FakeLambdaContext:
+    function_name: str = "local"
+    function_version: str = "$LATEST"
+    memory_limit_in_mb: int = 1024
+    aws_request_id: str = "00000000-0000-0000-0000-000000000000"
+    invoked_function_arn: str = "arn:aws:lambda:us-east-1:000000000000:function:local"
+    remaining_ms: int = 30000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+def _body(body: Union[None, str, bytes, Mapping]) -> Dict[str, Any]:
+    if body is None:
+        return dict(body=None, isBase64Encoded=False)
+    if isinstance(body, bytes):
+        return dict(body=base64.b64encode(body).decode(), isBase64Encoded=True)
+    if not isinstance(body, str):
+        body = json.dumps(body)
+    return dict(body=body, isBase64Encoded=False)
+
+
+def rest_api_event(
+    method: str,
+    path: str,
+    headers: Mapping[str, str] = None,
+    query: Mapping[str, List[str]] = None,
+    body: Union[None, str, bytes, Mapping] = None,
+) -> dict:
+    """Make an API Gateway REST API (payload version 1.0) proxy event."""
+    headers = dict(headers or {})
+    if isinstance(body, Mapping):
+        headers.setdefault("Content-Type", "application/json")
+    return dict(
+        httpMethod=method,
+        path=path,
+        headers=headers,
+        multiValueHeaders={k: [v] for k, v in headers.items()},
+        queryStringParameters={k: v[-1] for k, v in (query or {}).items()} or None,
+        multiValueQueryStringParameters=dict(query) if query else None,
+        requestContext=dict(
+            httpMethod=method, path=path, identity=dict(sourceIp="127.0.0.1")
+        ),
+        **_body(body),
+    )
+
+
+def http_api_event(
+    method: str,
+    path: str,
+    headers: Mapping[str, str] = None,
+    query: Mapping[str, List[str]] = None,
+    body: Union[None, str, bytes, Mapping] = None,
+    cookies: List[str] = None,
+) -> dict:
+    """Make an API Gateway HTTP API (payload version 2.0) event."""
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    if isinstance(body, Mapping):
+        headers.setdefault("content-type", "application/json")
+    event = dict(
+        version="2.0",
+        rawPath=path,
+        rawQueryString=urlencode(query or {}, doseq=True),
+        headers=headers,
+        requestContext=dict(http=dict(method=method, path=path, sourceIp="127.0.0.1")),
+        **_body(body),
+    )
+    if cookies:
+        event["cookies"] = cookies
+    return event
+
+
+def alb_event(
+    method: str,
+    path: str,
+    headers: Mapping[str, str] = None,
+    query: Mapping[str, str] = None,
+    body: Union[None, str, bytes, Mapping] = None,
+) -> dict:
+    """Make an application load balancer event, without multi-value headers."""
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    headers.setdefault("x-forwarded-for", "127.0.0.1")
+    if isinstance(body, Mapping):
+        headers.setdefault("content-type", "application/json")
+    return dict(
+        httpMethod=method,
+        path=path,
+        headers=headers,
+        queryStringParameters=dict(query or {}),
+        requestContext=dict(elb=dict(targetGroupArn="arn:aws:elasticloadbalancing")),
+        **_body(body),
+    )
+
+
+def s3_object_created_event(bucket: str, key: str, size: int) -> dict:
+    return dict(
+        Records=[
+            dict(
+                eventSource="aws:s3",
+                eventName="ObjectCreated:Put",
+                s3=dict(bucket=dict(name=bucket), object=dict(key=key, size=size)),
+            )
+        ]
+    )
+
+
+def replay(
+    handler, path: str, context: Optional[FakeLambdaContext] = None
+) -> List[Any]:
+    """Invoke `handler` with the events saved as JSON in `path`, returning the responses."""
+    with open(path) as f:
+        events = json.load(f)
+    if isinstance(events, dict):
+        events = [events]
+    context = context or FakeLambdaContext()
+    return [handler(event, context) for event in events]
@@ -1,20 +1,51 @@
 """Interface to Amazon S3."""
 import enum
+import json
+from functools import lru_cache
 from typing import Optional
 
-import boto3
 from flask import current_app
-from dataclasses_json import dataclass_json
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from typing import Dict
 
 
-@dataclass_json
 @dataclass
 class S3PresignedUpload:
+    """Presigned upload.
+
+    `from_dict`, `from_json` and `schema` load `dataclasses_json` on first use.
+    """
+
     url: str
     headers: Dict[str, str]
 
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, *args, **kwargs) -> "S3PresignedUpload":
+        return _dataclass_json(cls).from_dict(*args, **kwargs)
+
+    @classmethod
+    def from_json(cls, *args, **kwargs) -> "S3PresignedUpload":
+        return _dataclass_json(cls).from_json(*args, **kwargs)
+
+    @classmethod
+    def schema(cls, *args, **kwargs):
+        return _dataclass_json(cls).schema(*args, **kwargs)
+
+
+def _dataclass_json(cls):
+    """Add the `dataclasses_json` methods to `cls`, replacing the ones loading it."""
+    from dataclasses_json import DataClassJsonMixin, dataclass_json
+
+    if issubclass(cls, DataClassJsonMixin):
+        return cls
+    return dataclass_json(cls)
+
 
 @enum.unique
 class ACL(enum.Enum):
@@ -40,6 +71,8 @@ def get_default_bucket() -> str:
 
 
 def get_region() -> str:
+    import boto3
+
     session = boto3.session.Session()
     region = session.region_name
     if not region:
@@ -48,11 +81,16 @@ def get_region() -> str:
 
 
 def client(region: str = None):
-    session = boto3.session.Session()
-
     # try to determine current region
-    region = region or get_region()
+    return _client(region or get_region())
+
 
+@lru_cache(maxsize=None)
+def _client(region: str):
+    """Create a client once per region, they are slow to create and thread-safe."""
+    import boto3
+
+    session = boto3.session.Session()
     return session.client("s3", endpoint_url=f"https://s3.{region}.amazonaws.com")
 
 
@@ -0,0 +1,248 @@
+"""Run a Flask app on AWS Lambda.
+
+Handles API Gateway (REST and HTTP API) and ALB events as WSGI requests,
+and S3 object created notifications as asset uploads.
+The app, its DB connection pool and S3 clients are created once per Lambda container
+and reused by later invocations.
+
+::
+
+    # handler.py, with handler "handler.handler"
+    from jetkit.aws import lambda_handler
+
+    handler = lambda_handler(create_app, asset_model=Asset)
+"""
+import base64
+import logging
+import sys
+from io import BytesIO
+from typing import Callable, List, Optional, Type
+from urllib.parse import unquote_to_bytes, urlencode
+
+from flask import Flask
+from werkzeug.datastructures import Headers
+from werkzeug.test import run_wsgi_app
+
+log = logging.getLogger(__name__)
+
+# a Lambda container handles one request at a time, and RDS Proxy does the pooling
+LAMBDA_ENGINE_OPTIONS = dict(pool_size=1, max_overflow=0, pool_pre_ping=True)
+
+TEXT_MIME_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-www-form-urlencoded",
+    "image/svg+xml",
+}
+
+
+class LambdaHandler:
+    """Callable Lambda handler, see `lambda_handler`."""
+
+    def __init__(
+        self,
+        create_app: Callable[[], Flask],
+        asset_model: Optional[Type] = None,
+        warm_up: bool = True,
+    ):
+        self.create_app = create_app
+        self.asset_model = asset_model
+        self.warm_up = warm_up
+        self._app: Optional[Flask] = None
+
+    @property
+    def app(self) -> Flask:
+        if self._app is None:
+            self._app = self._init_app()
+        return self._app
+
+    def __call__(self, event: dict, context=None):
+        if is_s3_event(event):
+            return self.handle_s3_event(event)
+        return self.handle_http_event(event, context)
+
+    def handle_http_event(self, event: dict, context=None) -> dict:
+        environ = wsgi_environ(event, context)
+        app_iter, status, headers = run_wsgi_app(self.app, environ)
+        try:
+            body = b"".join(app_iter)
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close:
+                close()
+        return lambda_response(event, status, headers, body)
+
+    def handle_s3_event(self, event: dict) -> dict:
+        """Update assets for uploaded files.
+
+        Each record is committed separately. If any failed, the first error is raised after all records
+        were handled, so Lambda retries the invocation.
+        """
+        if self.asset_model is None:
+            raise RuntimeError("Got an S3 event but no asset_model is configured")
+
+        processed = 0
+        errors: List[Exception] = []
+        with self.app.app_context():
+            session = self.asset_model.query.session
+            for record in event["Records"]:
+                if not record.get("eventName", "").startswith("ObjectCreated"):
+                    continue
+                try:
+                    self.asset_model.process_s3_create_object_event(record)
+                    session.commit()
+                    processed += 1
+                except Exception as ex:
+                    log.exception(f"Failed to process S3 record {record.get('s3')}")
+                    session.rollback()
+                    errors.append(ex)
+        if errors:
+            raise errors[0]
+        return dict(processed=processed)
+
+    def _init_app(self) -> Flask:
+        app = self.create_app()
+        # used when the engine is created, which happens on first use
+        engine_options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        for option, value in LAMBDA_ENGINE_OPTIONS.items():
+            engine_options.setdefault(option, value)
+
+        if self.warm_up and "sqlalchemy" in app.extensions:
+            from jetkit.db.utils import warm_up
+
+            with app.app_context():
+                warm_up(app.extensions["sqlalchemy"].db)
+        return app
+
+
+def lambda_handler(
+    create_app: Callable[[], Flask],
+    asset_model: Optional[Type] = None,
+    warm_up: bool = True,
+) -> LambdaHandler:
+    """Get a Lambda handler running the app made by `create_app`.
+
+    :asset_model: S3Asset model to update for S3 object created events.
+    :warm_up: configure mappers and connect to the DB when the app is created.
+    """
+    return LambdaHandler(create_app, asset_model=asset_model, warm_up=warm_up)
+
+
+def is_s3_event(event: dict) -> bool:
+    records = event.get("Records") or [{}]
+    return records[0].get("eventSource") == "aws:s3"
+
+
+def is_alb_event(event: dict) -> bool:
+    return "elb" in event.get("requestContext", {})
+
+
+def wsgi_environ(event: dict, context=None) -> dict:
+    """Make a WSGI environ from an API Gateway or ALB event."""
+    if event.get("version") == "2.0":
+        http = event["requestContext"]["http"]
+        method = http["method"]
+        path = unquote_to_bytes(event.get("rawPath") or "/")
+        query = event.get("rawQueryString", "")
+        headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+        if event.get("cookies"):
+            headers["cookie"] = "; ".join(event["cookies"])
+        remote_addr = http.get("sourceIp")
+    else:
+        method = event["httpMethod"]
+        alb = is_alb_event(event)
+        if event.get("multiValueHeaders"):
+            headers = {
+                k.lower(): ", ".join(v) for k, v in event["multiValueHeaders"].items()
+            }
+        else:
+            headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+        query_params = event.get("multiValueQueryStringParameters") or event.get(
+            "queryStringParameters"
+        )
+        if alb:
+            # ALB passes path and query as received
+            path = unquote_to_bytes(event.get("path") or "/")
+            query = "&".join(
+                f"{k}={v}"
+                for k, values in (query_params or {}).items()
+                for v in (values if isinstance(values, list) else [values])
+            )
+            remote_addr = headers.get("x-forwarded-for", "").split(",")[0].strip()
+        else:
+            path = (event.get("path") or "/").encode()
+            query = urlencode(query_params or {}, doseq=True)
+            identity = event.get("requestContext", {}).get("identity") or {}
+            remote_addr = identity.get("sourceIp")
+
+    body = event.get("body") or ""
+    body_bytes = (
+        base64.b64decode(body) if event.get("isBase64Encoded") else body.encode()
+    )
+
+    environ = {
+        "REQUEST_METHOD": method,
+        "SCRIPT_NAME": "",
+        # WSGI strings are bytes decoded as latin-1
+        "PATH_INFO": path.decode("latin-1"),
+        "QUERY_STRING": query,
+        "SERVER_NAME": headers.get("host", "lambda"),
+        "SERVER_PORT": headers.get("x-forwarded-port", "443"),
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": remote_addr or "127.0.0.1",
+        "CONTENT_LENGTH": str(len(body_bytes)),
+        "CONTENT_TYPE": headers.get("content-type", ""),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": headers.get("x-forwarded-proto", "https"),
+        "wsgi.input": BytesIO(body_bytes),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "aws.event": event,
+        "aws.context": context,
+    }
+    for name, value in headers.items():
+        if name in ("content-type", "content-length"):
+            continue
+        environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    return environ
+
+
+def is_text(headers: Headers) -> bool:
+    if headers.get("Content-Encoding"):
+        return False
+    mime_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if mime_type.startswith("text/") or mime_type.endswith(("+json", "+xml")):
+        return True
+    return mime_type in TEXT_MIME_TYPES
+
+
+def lambda_response(event: dict, status: str, headers: Headers, body: bytes) -> dict:
+    """Make a response in the format expected for the type of `event`."""
+    response: dict = {"statusCode": int(status.split(" ", 1)[0])}
+    if is_text(headers):
+        response["body"] = body.decode()
+        response["isBase64Encoded"] = False
+    else:
+        response["body"] = base64.b64encode(body).decode()
+        response["isBase64Encoded"] = True
+
+    if event.get("version") == "2.0":
+        response["cookies"] = headers.getlist("Set-Cookie")
+        response["headers"] = {
+            name: ", ".join(headers.getlist(name))
+            for name in set(headers.keys())
+            if name.lower() != "set-cookie"
+        }
+    elif event.get("multiValueHeaders"):
+        response["multiValueHeaders"] = {
+            name: headers.getlist(name) for name in set(headers.keys())
+        }
+    else:
+        response["headers"] = dict(headers.items())
+
+    if is_alb_event(event):
+        response["statusDescription"] = status
+    return response
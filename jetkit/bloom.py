@@ -0,0 +1,50 @@
+"""Bloom filter for fast negative membership checks.
+
+A Bloom filter answers "definitely not present" or "maybe present" for an item,
+using a few bits per item regardless of the items' size.
+"""
+import hashlib
+import math
+from typing import Iterable, Iterator
+
+
+class BloomFilter:
+    """Set of strings that can have false positives, but no false negatives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """Size the filter to hold `capacity` items with a false positive rate of `error_rate`."""
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def from_items(
+        cls, items: Iterable[str], error_rate: float = 0.001, headroom: int = 1000
+    ) -> "BloomFilter":
+        """Build a filter containing `items`, with room for `headroom` more."""
+        items = list(items)
+        bloom = cls(len(items) + headroom, error_rate=error_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # double hashing: derive all positions from two 64 bit hashes
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
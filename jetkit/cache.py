@@ -0,0 +1,113 @@
+"""Cache backends.
+
+`LRUCache` keeps entries in process memory.
+To share a cache between processes or hosts, implement `CacheBackend`
+on top of a shared store (e.g. Redis or memcached).
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CacheBackend(ABC):
+    """Interface for cache storage.
+
+    Besides entries, backends keep named version counters that are never evicted.
+    Including a counter in a cache key and incrementing it invalidates every entry
+    that was stored under the old version.
+    """
+
+    stats: CacheStats
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None if not present or expired."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, expiring after `ttl` seconds if set."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_version(self, name: str) -> int:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def incr_version(self, name: str) -> int:
+        raise NotImplementedError()
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process cache evicting least recently used entries beyond `maxsize`."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        # key -> (expires at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = (
+            OrderedDict()
+        )
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                del self._entries[key]
+            self.stats.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_version(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def incr_version(self, name: str) -> int:
+        with self._lock:
+            version = self._versions.get(name, 0) + 1
+            self._versions[name] = version
+            return version
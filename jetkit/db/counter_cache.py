@@ -0,0 +1,167 @@
+"""Keep counts of related rows in a column, maintained by Postgres triggers.
+
+::
+
+    class User(db.Model):
+        asset_count = Column(Integer, nullable=False, server_default="0")
+
+    class Asset(db.Model, SoftDeletable):
+        owner_id = Column(Integer, ForeignKey("user.id"))
+
+    counter_cache(Asset.owner_id, User.asset_count)
+
+`User.asset_count` is then updated whenever an asset is inserted, deleted, soft-deleted,
+restored or given another owner, in the same transaction.
+Loaded users don't see the change until they are refreshed.
+Concurrent transactions adding rows for the same owner wait for each other to update the count.
+
+The triggers are created along with the table of the counted rows.
+For existing tables, create them in a migration with `CounterCache.create_triggers`,
+then fill in counts with `flask backfill-counter-caches`.
+"""
+from typing import List, Optional
+
+import click
+from flask import Flask
+from sqlalchemy import Column, func, select
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+from jetkit.db.utils import on_table_create
+
+
+class CounterCache:
+    """Count rows referencing a parent row through `foreign_key` in `counter`.
+
+    Rows with `soft_delete_column` set aren't counted.
+    """
+
+    def __init__(
+        self, foreign_key: Column, counter: Column, soft_delete_column: Optional[str]
+    ):
+        self.foreign_key = foreign_key
+        self.counter = counter
+        self.soft_delete_column = soft_delete_column
+        (fk,) = foreign_key.foreign_keys
+        self.parent_key = fk.column
+        self.name = f"{foreign_key.table.name}_{foreign_key.name}_{counter.name}"
+
+    def create_triggers(self, bind) -> None:
+        child = self.foreign_key.table.name
+        parent = self.counter.table.name
+        fk = self.foreign_key.name
+        counter = self.counter.name
+        parent_key = self.parent_key.name
+
+        counted_new = f"NEW.{fk} IS NOT NULL"
+        counted_old = f"OLD.{fk} IS NOT NULL"
+        unchanged = f"OLD.{fk} IS NOT DISTINCT FROM NEW.{fk}"
+        columns = fk
+        if self.soft_delete_column:
+            deleted = self.soft_delete_column
+            counted_new += f" AND NEW.{deleted} IS NULL"
+            counted_old += f" AND OLD.{deleted} IS NULL"
+            unchanged += f" AND (OLD.{deleted} IS NULL) = (NEW.{deleted} IS NULL)"
+            columns += f", {deleted}"
+
+        bind.execute(f"""
+            CREATE OR REPLACE FUNCTION "{self.name}"() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND {unchanged} THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP IN ('UPDATE', 'DELETE') AND {counted_old} THEN
+                    UPDATE "{parent}" SET {counter} = {counter} - 1 WHERE {parent_key} = OLD.{fk};
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') AND {counted_new} THEN
+                    UPDATE "{parent}" SET {counter} = {counter} + 1 WHERE {parent_key} = NEW.{fk};
+                END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS "{self.name}" ON "{child}";
+            CREATE TRIGGER "{self.name}"
+                AFTER INSERT OR UPDATE OF {columns} OR DELETE ON "{child}"
+                FOR EACH ROW EXECUTE PROCEDURE "{self.name}"();
+            """)
+
+    def backfill(self, session, batch_size: int = 1000) -> int:
+        """Recount all parent rows, committing after each batch of `batch_size` rows.
+
+        Safe to run while rows are being added: each batch of parent rows is locked first,
+        so triggers of concurrent transactions finish before the recount,
+        which then runs as a separate statement seeing their committed rows.
+        The lock is FOR NO KEY UPDATE, which foreign key checks of new rows don't wait for.
+
+        :returns: number of updated parent rows
+        """
+        parent_table = self.counter.table
+        parent_key = parent_table.c[self.parent_key.name]
+        child_table = self.foreign_key.table
+        count = select([func.count()]).where(self.foreign_key == parent_key)
+        if self.soft_delete_column:
+            count = count.where(child_table.c[self.soft_delete_column].is_(None))
+
+        updated = 0
+        last_key = None
+        while True:
+            batch = (
+                select([parent_key])
+                .order_by(parent_key)
+                .limit(batch_size)
+                .with_for_update(key_share=True)
+            )
+            if last_key is not None:
+                batch = batch.where(parent_key > last_key)
+            keys = [key for key, in session.execute(batch)]
+            if not keys:
+                return updated
+            session.execute(
+                parent_table.update()
+                .where(parent_key.in_(keys))
+                .values({self.counter.name: count.as_scalar()})
+            )
+            session.commit()
+            updated += len(keys)
+            last_key = keys[-1]
+
+
+# all counter caches, for backfilling
+counter_caches: List[CounterCache] = []
+
+
+def counter_cache(
+    foreign_key: InstrumentedAttribute,
+    counter: InstrumentedAttribute,
+    soft_delete_column: Optional[str] = None,
+) -> CounterCache:
+    """Keep `counter` equal to the number of rows referencing its row through `foreign_key`.
+
+    :soft_delete_column: rows where it is set aren't counted,
+        defaults to `deleted_at` if the counted table has it.
+    """
+    model = foreign_key.class_
+    if soft_delete_column is None and "deleted_at" in model.__table__.c:
+        soft_delete_column = "deleted_at"
+
+    cache = CounterCache(
+        foreign_key.property.columns[0],
+        counter.property.columns[0],
+        soft_delete_column,
+    )
+    on_table_create(model, lambda table, bind, **kw: cache.create_triggers(bind))
+    counter_caches.append(cache)
+    return cache
+
+
+def register_counter_cache_commands(app: Flask) -> None:
+    """Add a `flask backfill-counter-caches` command."""
+
+    @app.cli.command("backfill-counter-caches")
+    @click.option(
+        "--batch-size", default=1000, help="Parent rows updated per transaction."
+    )
+    def backfill_counter_caches(batch_size: int):
+        """Recount all counter caches."""
+        db = app.extensions["sqlalchemy"].db
+        for cache in counter_caches:
+            updated = cache.backfill(db.session, batch_size=batch_size)
+            click.echo(f"{cache.name}: recounted {updated} rows")
@@ -1,6 +1,10 @@
 from typing import TYPE_CHECKING
 from abc import abstractmethod
 
+from sqlalchemy import Index
+
+from jetkit.db.query.owned import OwnedQuery
+
 if TYPE_CHECKING:
     import jetkit.model.user
 
@@ -13,7 +17,22 @@ class Owned:
     def id(self):
         ...
 
+    @property
+    @abstractmethod
+    def owner_id(self) -> int:
+        ...
+
     @property
     @abstractmethod
     def owner(self) -> "jetkit.model.user.CoreUser":
         ...
+
+
+def owner_created_at_index(tablename: str, owner_column: str = "owner_id") -> Index:
+    """Index for listing rows of an owner by creation time, add it to `__table_args__`."""
+    return Index(
+        f"{tablename}_{owner_column}_created_at_idx", owner_column, "created_at"
+    )
+
+
+__all__ = ("Owned", "OwnedQuery", "owner_created_at_index")
@@ -0,0 +1,351 @@
+"""Range partitioning by `created_at` for tables that only grow.
+
+Each partition holds the rows created during one day, week, month or year.
+Queries filtering on `created_at` only scan matching partitions,
+and old rows are removed by dropping whole partitions instead of deleting rows.
+
+::
+
+    class AuditLog(Partitioned, db.Model):
+        partition_interval = "month"
+        partition_retention = 12
+
+    # daily, e.g. from cron
+    flask maintain-partitions
+
+Postgres requires unique constraints on partitioned tables to include `created_at`,
+so the primary key is `(id, created_at)`, while the ORM still identifies rows by `id` alone.
+Column combinations listed in `globally_unique` are kept unique across partitions through
+a key table maintained by a trigger.
+Other tables can't have foreign keys to `id` of a partitioned table.
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import click
+from flask import Flask
+from sqlalchemy import Column, Index, Integer, event, func, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.declarative import declared_attr
+
+from jetkit.db.model import TSTZ
+from jetkit.db.upsert import OnConflictBehavior, Upsertable
+from jetkit.db.utils import on_table_create
+
+log = logging.getLogger(__name__)
+
+INTERVALS = ("day", "week", "month", "year")
+PARTITION_NAME = re.compile(r"_p(\d{8})$")
+
+
+def partition_start(moment: datetime, interval: str) -> datetime:
+    """Get the start of the partition containing `moment`, in UTC."""
+    moment = moment.astimezone(timezone.utc)
+    day = datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    if interval == "year":
+        return day.replace(month=1, day=1)
+    raise ValueError(f"Partition interval must be one of {INTERVALS}, not {interval}")
+
+
+def next_partition_start(start: datetime, interval: str, count: int = 1) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=count)
+    if interval == "week":
+        return start + timedelta(weeks=count)
+    if interval == "month":
+        months = start.year * 12 + start.month - 1 + count
+        return start.replace(year=months // 12, month=months % 12 + 1)
+    if interval == "year":
+        return start.replace(year=start.year + count)
+    raise ValueError(f"Partition interval must be one of {INTERVALS}, not {interval}")
+
+
+class Partitioned(Upsertable):
+    """Model mixin, list it before `db.Model`.
+
+    Partitions for the current and the next `partitions_ahead` intervals are created with the table.
+    Run `maintain_partitions` regularly to create future partitions and drop expired ones.
+    Rows outside of all partitions go to a default partition,
+    and are moved to the partitions created for them later.
+    """
+
+    __tablename__: str
+
+    # length of time covered by each partition, one of INTERVALS
+    partition_interval = "month"
+    # partitions created ahead of the current one
+    partitions_ahead = 3
+    # past partitions to keep, besides the current one. None keeps all
+    partition_retention: Optional[int] = None
+    # column combinations unique across all partitions
+    globally_unique: Tuple[Tuple[str, ...], ...] = ()
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(
+        TSTZ, primary_key=True, nullable=False, server_default=func.now()
+    )
+
+    @declared_attr
+    def __table_args__(self):
+        indexes = tuple(
+            Index(f"{self.__tablename__}_{'_'.join(columns)}_idx", *columns)
+            for columns in self.globally_unique
+        )
+        return indexes + ({"postgresql_partition_by": "RANGE (created_at)"},)
+
+    @declared_attr
+    def __mapper_args__(self):
+        return {"primary_key": [self.id]}
+
+    @classmethod
+    def partitions(cls, bind=None) -> List[Tuple[str, datetime]]:
+        """Get names and start times of partitions, oldest first. The default partition isn't included."""
+        bind = bind or cls.query.session
+        rows = bind.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table AS regclass)"
+            ),
+            dict(table=cls.__tablename__),
+        )
+        partitions = []
+        for (name,) in rows:
+            match = PARTITION_NAME.search(name)
+            if match:
+                start = datetime.strptime(match.group(1), "%Y%m%d")
+                partitions.append((name, start.replace(tzinfo=timezone.utc)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    @classmethod
+    def create_partitions(cls, bind=None, now: datetime = None) -> List[str]:
+        """Create missing partitions up to `partitions_ahead` intervals after the current one.
+
+        :returns: names of created partitions
+        """
+        bind = bind or cls.query.session
+        interval = cls.partition_interval
+        existing = {name for name, _ in cls.partitions(bind)}
+        start = partition_start(now or datetime.now(timezone.utc), interval)
+        created = []
+        for _ in range(cls.partitions_ahead + 1):
+            end = next_partition_start(start, interval)
+            name = f"{cls.__tablename__}_p{start:%Y%m%d}"
+            if name not in existing:
+                cls._create_partition(bind, name, start, end)
+                created.append(name)
+            start = end
+        return created
+
+    @classmethod
+    def drop_expired_partitions(
+        cls,
+        bind=None,
+        retention: int = None,
+        detach: bool = False,
+        now: datetime = None,
+    ) -> List[str]:
+        """Drop partitions older than `retention` intervals before the current one.
+
+        :detach: keep expired partitions as standalone tables instead of dropping them.
+        :returns: names of dropped or detached partitions
+        """
+        retention = cls.partition_retention if retention is None else retention
+        if retention is None:
+            return []
+        bind = bind or cls.query.session
+        interval = cls.partition_interval
+        current = partition_start(now or datetime.now(timezone.utc), interval)
+        cutoff = next_partition_start(current, interval, -retention)
+
+        expired = []
+        for name, start in cls.partitions(bind):
+            end = next_partition_start(start, interval)
+            if end > cutoff:
+                break
+            if detach:
+                bind.execute(
+                    f'ALTER TABLE "{cls.__tablename__}" DETACH PARTITION "{name}"'
+                )
+            else:
+                bind.execute(f'DROP TABLE "{name}"')
+            # rows are removed without deleting them, so the key table trigger doesn't run
+            for columns in cls.globally_unique:
+                bind.execute(
+                    text(
+                        f'DELETE FROM "{cls._key_table_name(columns)}" '
+                        "WHERE created_at >= :start AND created_at < :end"
+                    ),
+                    dict(start=start, end=end),
+                )
+            expired.append(name)
+        return expired
+
+    @classmethod
+    def maintain_partitions(cls, bind=None, now: datetime = None) -> None:
+        """Create future partitions and drop expired ones."""
+        created = cls.create_partitions(bind, now=now)
+        dropped = cls.drop_expired_partitions(bind, now=now)
+        log.info(
+            f"{cls.__tablename__}: created partitions {created}, dropped {dropped}"
+        )
+
+    @classmethod
+    def upsert_row(
+        cls,
+        row_class,
+        *,
+        index_elements: List[str] = None,
+        constraint=None,
+        set_=None,
+        should_return_result=True,
+        values,
+        on_conflict: OnConflictBehavior = OnConflictBehavior.ON_CONFLICT_DO_UPDATE,
+    ):
+        """Upsert on a `globally_unique` column combination, which ON CONFLICT can't use."""
+        if not index_elements or tuple(index_elements) not in cls.globally_unique:
+            return super().upsert_row(
+                row_class,
+                index_elements=index_elements,
+                constraint=constraint,
+                set_=set_,
+                should_return_result=should_return_result,
+                values=values,
+                on_conflict=on_conflict,
+            )
+
+        session = row_class.query.session
+        key = {column: values[column] for column in index_elements}
+        for attempt in range(2):
+            row = row_class.query.filter_by(**key).with_for_update().one_or_none()
+            if row is not None:
+                if on_conflict is OnConflictBehavior.ON_CONFLICT_DO_UPDATE:
+                    for attr, value in (set_ or values).items():
+                        setattr(row, attr, value)
+                    session.flush()
+                break
+            try:
+                with session.begin_nested():
+                    row = row_class(**values)
+                    session.add(row)
+                break
+            except IntegrityError as ex:
+                # inserted concurrently, update that row instead
+                if attempt or not cls._is_key_conflict(ex, tuple(index_elements)):
+                    raise
+
+        is_do_nothing = on_conflict is OnConflictBehavior.ON_CONFLICT_DO_NOTHING
+        if not should_return_result or is_do_nothing:
+            return None
+        session.expire(row)
+        return row
+
+    @classmethod
+    def _create_partition(cls, bind, name: str, start: datetime, end: datetime) -> None:
+        table = cls.__tablename__
+        default = f"{table}_default"
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = "WHERE created_at >= :start AND created_at < :end"
+        range_ = dict(start=start, end=end)
+        has_default_rows = bind.execute(
+            text(f'SELECT EXISTS (SELECT 1 FROM "{default}" {in_range})'), range_
+        ).scalar()
+        if not has_default_rows:
+            bind.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}')
+            return
+
+        # Postgres can't create a partition for rows in the default partition,
+        # so move them to a new table first and attach that.
+        # Triggers are disabled while moving, the rows stay in the parent table.
+        # This locks the default partition until the transaction ends.
+        log.info(f"Moving rows from {default} to new partition {name}")
+        bind.execute(
+            f'CREATE TABLE "{name}" '
+            f'(LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        bind.execute(f'ALTER TABLE "{default}" DISABLE TRIGGER USER')
+        bind.execute(
+            text(
+                f'WITH moved AS (DELETE FROM "{default}" {in_range} RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved'
+            ),
+            range_,
+        )
+        bind.execute(f'ALTER TABLE "{default}" ENABLE TRIGGER USER')
+        bind.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" {bounds}')
+
+    @classmethod
+    def _key_table_name(cls, columns: Tuple[str, ...]) -> str:
+        return f"{cls.__tablename__}_{'_'.join(columns)}_key"
+
+    @classmethod
+    def _is_key_conflict(cls, ex: IntegrityError, columns: Tuple[str, ...]) -> bool:
+        """Check if `ex` was raised by a duplicate in the key table for `columns`."""
+        diag = getattr(ex.orig, "diag", None)
+        constraint = getattr(diag, "constraint_name", None)
+        return constraint == f"{cls._key_table_name(columns)}_pkey"
+
+    @classmethod
+    def _create_partitioning(cls, table, bind, **kw) -> None:
+        bind.execute(
+            f'CREATE TABLE "{table.name}_default" PARTITION OF "{table.name}" DEFAULT'
+        )
+        cls.create_partitions(bind)
+        for columns in cls.globally_unique:
+            cls._create_key_table(table, bind, columns)
+
+    @classmethod
+    def _create_key_table(cls, table, bind, columns: Tuple[str, ...]) -> None:
+        key_table = cls._key_table_name(columns)
+        column_defs = ", ".join(
+            f"{column} {table.c[column].type.compile(dialect=bind.dialect)} NOT NULL"
+            for column in columns
+        )
+        old_matches = " AND ".join(f"{column} = OLD.{column}" for column in columns)
+        new_not_null = " AND ".join(f"NEW.{column} IS NOT NULL" for column in columns)
+        new_values = ", ".join(f"NEW.{column}" for column in columns)
+        column_list = ", ".join(columns)
+        bind.execute(f"""
+            CREATE TABLE "{key_table}" (
+                {column_defs},
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                PRIMARY KEY ({column_list})
+            );
+            CREATE FUNCTION "{key_table}_sync"() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM "{key_table}" WHERE {old_matches};
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') AND {new_not_null} THEN
+                    INSERT INTO "{key_table}" ({column_list}, created_at) VALUES ({new_values}, NEW.created_at);
+                END IF;
+                RETURN NULL;
+            END $$;
+            CREATE TRIGGER "{key_table}_sync"
+                AFTER INSERT OR UPDATE OF {column_list}, created_at OR DELETE ON "{table.name}"
+                FOR EACH ROW EXECUTE PROCEDURE "{key_table}_sync"();
+            """)
+
+
+@event.listens_for(Partitioned, "instrument_class", propagate=True)
+def _partition_on_create(mapper, class_):
+    on_table_create(class_, class_._create_partitioning)
+
+
+def register_partition_commands(app: Flask, *models) -> None:
+    """Add a `flask maintain-partitions` command for partitioned `models`."""
+
+    @app.cli.command("maintain-partitions")
+    def maintain_partitions():
+        """Create future partitions and drop expired ones."""
+        for model in models:
+            model.maintain_partitions()
+            model.query.session.commit()
+        click.echo(f"Maintained partitions of {len(models)} tables")
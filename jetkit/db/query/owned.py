@@ -0,0 +1,73 @@
+"""Scope queries to rows owned by the user making the request.
+
+::
+
+    class Note(db.Model):
+        query_class = OwnedQuery
+        __table_args__ = (owner_created_at_index("note"),)
+
+        owner_id = Column(Integer, ForeignKey("user.id"))
+
+    Note.query.order_by(Note.created_at.desc())  # only the current user's notes
+
+Queries get `WHERE owner_id = :user_id`, so rows of other users are never fetched,
+and listings of one user's rows newest first are a range scan of the `(owner_id, created_at)` index.
+
+The user is identified by the access token of the current request, without loading it.
+Admins see all rows, and so does code running outside of requests, like commands.
+Requests without an access token see no rows.
+"""
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+from flask import has_request_context
+from sqlalchemy import false
+
+from jetkit.db.query.filter import QueryFilter, FilteredQuery
+
+if TYPE_CHECKING:
+    from jetkit.db.owned import Owned
+
+# user type values which can see rows of all owners
+OWNER_BYPASS_USER_TYPES = {"admin"}
+
+
+def current_owner() -> Tuple[bool, Optional[Any]]:
+    """Get whether rows should be scoped to an owner, and the ID of that owner."""
+    if not has_request_context():
+        return False, None
+
+    from flask_jwt_extended import get_jwt_identity
+
+    from jetkit.api import current_user_type
+
+    identity = get_jwt_identity()
+    if identity is None:
+        return True, None
+    if current_user_type() in OWNER_BYPASS_USER_TYPES:
+        return False, None
+    return True, identity
+
+
+class OwnedQueryFilter(QueryFilter):
+    """Omit rows owned by other users."""
+
+    def apply_default_filter(self) -> "OwnedQueryFilter":
+        assert isinstance(self, QueryFilter)
+        scoped, owner_id = current_owner()
+        if not scoped:
+            return self
+        if owner_id is None:
+            return self.filter(false())
+        return self.filter(self.entity.owner_id == owner_id)
+
+    def get_filter(self, obj: "Owned") -> bool:
+        if obj is None:
+            return True
+        scoped, owner_id = current_owner()
+        return not scoped or (owner_id is not None and obj.owner_id == owner_id)
+
+
+class OwnedQuery(FilteredQuery):
+    """Query mixin."""
+
+    default_filters = [OwnedQueryFilter]
@@ -0,0 +1,40 @@
+from typing import Any
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    Text,
+    UniqueConstraint,
+    func,
+)
+
+
+class RateLimitCounter:
+    """Model mixin for a table of rate limit counters, see `jetkit.api.rate_limit.PostgresRateLimitBackend`.
+
+    ::
+
+        class RateLimit(db.Model, RateLimitCounter):
+            pass
+    """
+
+    query: Any
+    __table_args__ = (UniqueConstraint("key", "window"),)
+
+    key = Column(Text(), nullable=False)
+    # start of the window in seconds since the epoch, divided by the window length
+    window = Column(BigInteger(), nullable=False)
+    count = Column(Integer(), nullable=False, default=1)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    @classmethod
+    def delete_expired(cls) -> int:
+        """Delete counters that can't affect limits anymore.
+
+        :returns: number of deleted counters
+        """
+        return cls.query.filter(cls.expires_at < func.now()).delete(
+            synchronize_session=False
+        )
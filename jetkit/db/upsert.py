@@ -1,8 +1,11 @@
 from typing import Any, Dict, List, Optional
 from flask_sqlalchemy import Model
+from sqlalchemy import Table
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from enum import unique, Enum
 
+from jetkit.db.utils import mark_tables_changed
+
 
 @unique
 class OnConflictBehavior(Enum):
@@ -11,6 +14,11 @@ class OnConflictBehavior(Enum):
 
 
 class Upsertable:
+    """Model mixin."""
+
+    __table__: Table
+    query: Any
+
     @classmethod
     def upsert_row(
         cls,
@@ -71,3 +79,34 @@ class Upsertable:
         assert result
         session.expire(result)
         return result
+
+    @classmethod
+    def insert_or_ignore(
+        cls,
+        *,
+        index_elements: List[str] = None,
+        constraint=None,
+        values: Dict[str, Any],
+    ) -> Optional[Model]:
+        """Insert a row unless it conflicts, in one round trip.
+
+        Runs `INSERT ... ON CONFLICT DO NOTHING RETURNING *` on `cls.__table__`,
+        so it only suits models mapped to a single table.
+        ORM events don't run, but the table is marked as changed for `jetkit.api.cache`.
+        :returns: the inserted model, or None if a row with the same index elements or constraint exists.
+        """
+        insert_query = pg_insert(cls.__table__).values(**values)
+        if index_elements:
+            insert_query = insert_query.on_conflict_do_nothing(
+                index_elements=index_elements
+            )
+        else:
+            insert_query = insert_query.on_conflict_do_nothing(constraint=constraint)
+        insert_query = insert_query.returning(*cls.__table__.columns)
+
+        query = cls.query
+        res = query.session.execute(insert_query)
+        row = next(query.instances(res), None)
+        if row is not None:
+            mark_tables_changed(query.session, cls.__table__.name)
+        return row
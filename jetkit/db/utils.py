@@ -1,5 +1,6 @@
 from sqlalchemy.event import listen
 from sqlalchemy import Table
+from sqlalchemy.orm import configure_mappers
 from functools import partial
 
 
@@ -25,6 +26,15 @@ def escape_like(query: str, escape_character: str) -> str:
     return query
 
 
+# session.info key of the names of tables written in the current transaction
+CHANGED_TABLES_KEY = "jetkit.changed_tables"
+
+
+def mark_tables_changed(session, *tables: str) -> None:
+    """Record tables written without the ORM, so caches depending on them are invalidated on commit."""
+    session.info.setdefault(CHANGED_TABLES_KEY, set()).update(tables)
+
+
 def on_table_create(class_, ddl):
     """Run DDL on model class `class_` after creation, whether in migration or in deploy (as in tests)."""
 
@@ -33,3 +43,31 @@ def on_table_create(class_, ddl):
             ddl(table, bind, **kw)
 
     listen(Table, "after_create", partial(listener, class_.__table__.name, ddl))
+
+
+# SQLSTATE raised by Postgres when a statement is cancelled, e.g. by `statement_timeout`
+QUERY_CANCELED_PGCODE = "57014"
+
+
+def set_statement_timeout(session, timeout_ms: int) -> None:
+    """Limit how long any statement in the current transaction may run.
+
+    Uses `SET LOCAL`, so the timeout is reset when the transaction ends.
+    """
+    session.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def is_query_canceled(error: Exception) -> bool:
+    """Check if a DB error was caused by the statement being cancelled."""
+    orig = getattr(error, "orig", None)
+    return getattr(orig, "pgcode", None) == QUERY_CANCELED_PGCODE
+
+
+def warm_up(db) -> None:
+    """Do one-time setup before the first request, e.g. in the Lambda init phase.
+
+    Configures mappers and opens a connection, which is kept in the pool. Needs an app context.
+    """
+    configure_mappers()
+    with db.engine.connect() as conn:
+        conn.execute("SELECT 1")
@@ -0,0 +1,43 @@
+"""Optimistic concurrency control.
+
+Rows of `Versioned` models carry a version number, incremented by each update.
+Updates are made with `UPDATE ... WHERE id = :id AND version = :loaded_version`,
+so an update based on an outdated row matches no rows and fails with `StaleDataError`
+instead of overwriting the other change. No rows are locked.
+"""
+from typing import Optional
+
+from sqlalchemy import Column, Integer
+from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm.exc import StaleDataError
+
+
+class VersionConflict(StaleDataError):
+    """The row was changed since the version the client based its change on."""
+
+
+class Versioned:
+    """Model mixin.
+
+    Map conflicts to 409 with `app.register_error_handler(StaleDataError, handle_version_conflict)`.
+    """
+
+    version = Column(Integer, nullable=False, server_default="1")
+
+    @declared_attr
+    def __mapper_args__(self):
+        return {"version_id_col": self.version}
+
+    @property
+    def etag(self) -> str:
+        return str(self.version)
+
+    def check_version(self, version: Optional[int]) -> None:
+        """Check that a change was based on the current version.
+
+        :raises: VersionConflict if it wasn't
+        """
+        if version is not None and version != self.version:
+            raise VersionConflict(
+                f"{self.__class__.__name__} {self.id} is at version {self.version}, not {version}"  # type: ignore
+            )
@@ -0,0 +1,73 @@
+"""Prepare an app for servers that load it once and fork workers, like `gunicorn --preload`.
+
+Before forking, the parent configures mappers and closes its DB connections, so workers don't
+share sockets, then moves all its objects to a permanent GC generation with `gc.freeze()`.
+Without that, the first garbage collection in each worker writes to every object it inherited,
+copying the memory pages holding them.
+After forking, each worker replaces connection pools and clients it inherited.
+
+In `gunicorn.conf.py`:
+
+::
+
+    from jetkit.lifecycle import post_fork, pre_fork  # noqa: F401
+
+    preload_app = True
+"""
+import gc
+import logging
+from typing import Iterator
+
+from flask import Flask
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import configure_mappers
+
+log = logging.getLogger(__name__)
+
+
+def engines(app: Flask) -> Iterator[Engine]:
+    """Get the engines for the default database and all binds of `app`."""
+    if "sqlalchemy" not in app.extensions:
+        return
+    db = app.extensions["sqlalchemy"].db
+    for bind in [None, *(app.config.get("SQLALCHEMY_BINDS") or {})]:
+        yield db.get_engine(app, bind)
+
+
+def prepare_for_fork(app: Flask) -> None:
+    """Do shared setup in the parent, and keep it from being copied by workers."""
+    with app.app_context():
+        configure_mappers()
+        for engine in engines(app):
+            engine.dispose()
+    gc.collect()
+    gc.freeze()
+    log.debug(f"Froze {gc.get_freeze_count()} objects before forking")
+
+
+def after_fork(app: Flask) -> None:
+    """Replace connection pools and clients inherited from the parent, in a worker."""
+    for engine in engines(app):
+        # closing the inherited connections would close them for the parent too
+        engine.pool = engine.pool.recreate()
+    app.extensions.pop("jetkit_mail_clients", None)
+    # the parent's hashing threads don't exist in the worker, don't wait for them
+    app.extensions.pop("jetkit_password_hasher", None)
+
+    import jetkit.aws.s3
+
+    jetkit.aws.s3._client.cache_clear()
+
+
+def _server_app(server) -> Flask:
+    return server.app.wsgi()
+
+
+def pre_fork(server, worker) -> None:
+    """Gunicorn hook."""
+    prepare_for_fork(_server_app(server))
+
+
+def post_fork(server, worker) -> None:
+    """Gunicorn hook."""
+    after_fork(_server_app(server))
@@ -1,7 +1,7 @@
 """Mail sending common functionality."""
 from jetkit.mail.constant import MailerImplementation
 from abc import ABC, abstractmethod
-from typing import Mapping, List, TypeVar, Type, Optional, Union
+from typing import Any, Mapping, List, TypeVar, Type, Optional, Union
 
 MailClient = TypeVar("MailClient", bound="MailClientBase")
 
@@ -33,13 +33,17 @@ class MailClientBase(ABC):
 
     @classmethod
     def new_from_flask(cls: Type[MailClient], app=None, **kwargs) -> MailClient:
-        """Create new client using flask config."""
+        """Get a client using flask config, created once per app."""
         if not app:
             from flask import current_app
 
-            app = current_app
+            app = current_app._get_current_object()
 
-        return cls(config=app.config)
+        clients = app.extensions.setdefault("jetkit_mail_clients", {})
+        client = clients.get(cls)
+        if client is None:
+            client = clients[cls] = cls(config=app.config)
+        return client
 
     @classmethod
     def new_for_impl(
@@ -55,6 +59,10 @@ class MailClientBase(ABC):
             from jetkit.mail.impl.mailgun import MailgunClient
 
             impl_cls = MailgunClient
+        elif impl is MailerImplementation.smtp:
+            from jetkit.mail.impl.smtp import SMTPClient
+
+            impl_cls = SMTPClient
 
         if not impl_cls:
             raise NotImplementedError(f"Unimplemented mailer {impl}")
@@ -78,3 +86,32 @@ class MailClientBase(ABC):
     ):
         """Send an email."""
         raise NotImplementedError()
+
+    def send_batch(
+        self,
+        *,
+        subject: str,
+        template: str,
+        recipients: Mapping[str, Mapping[str, Any]],
+        sender: str = None,
+        variables: Mapping[str, str] = None,
+        **kwargs,
+    ) -> List:
+        """Send an email to each recipient, with their own template variables.
+
+        :recipients: maps recipient email addresses to their variables,
+            which are added to `variables` shared by all recipients.
+
+        Sends one message per recipient, implementations can override this with a batch API.
+        """
+        return [
+            self.send(
+                subject=subject,
+                template=template,
+                to=[email],
+                sender=sender,
+                variables={**(variables or {}), **recipient_variables},
+                **kwargs,
+            )
+            for email, recipient_variables in recipients.items()
+        ]
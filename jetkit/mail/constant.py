@@ -5,4 +5,5 @@ from enum import Enum, unique
 class MailerImplementation(Enum):
     dummy = "dummy"
     mailgun = "mailgun"
+    smtp = "smtp"
     ses = "ses"  # TBD
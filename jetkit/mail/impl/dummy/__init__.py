@@ -1,14 +1,24 @@
 """Mail client that doesn't actually send mail."""
-
 from jetkit.mail.base import MailClientBase
-from typing import List, Mapping
+from collections import deque
+from typing import Deque, List, Mapping
 import pprint
 import logging
 
 log = logging.getLogger(__name__)
 
+DEFAULT_MAX_SENT = 1000
+
 
 class DummyClient(MailClientBase):
+    """Records the last `EMAIL_DUMMY_MAX_SENT` messages in `sent` instead of sending them."""
+
+    sent: Deque[dict]
+
+    def __init__(self, config):
+        super().__init__(config=config)
+        self.sent = deque(maxlen=config.get("EMAIL_DUMMY_MAX_SENT", DEFAULT_MAX_SENT))
+
     def send(
         self,
         *,
@@ -24,3 +34,13 @@ class DummyClient(MailClientBase):
         log.info(f"  Subject: {subject}")
         log.info(f"  Template: {template}")
         log.info(f"  Variables: {pprint.pformat(variables, indent=4)}")
+        self.sent.append(
+            dict(
+                subject=subject,
+                template=template,
+                to=to,
+                sender=sender or self.default_sender,
+                variables=variables,
+                **kwargs,
+            )
+        )
@@ -1,11 +1,51 @@
+import itertools
 import json
 
 import requests
-from typing import List, Mapping, Tuple
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib3.util.retry import Retry
 from jetkit.mail.base import MailClientBase
 
 MAILGUN_BASE_URL = "https://api.mailgun.net/v3"
 
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 30)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+# recipients per message the API accepts
+MAX_BATCH_RECIPIENTS = 1000
+
+
+def new_session(pool_size: int, retries: int) -> requests.Session:
+    """Create a session keeping up to `pool_size` connections alive, retrying requests Mailgun didn't accept.
+
+    Sending isn't idempotent, so requests are only retried after connection errors
+    and 429 or 503 responses with a `Retry-After` header, never after read timeouts or other errors,
+    when the message may have been sent already.
+    Retries back off exponentially, or wait as long as `Retry-After` says.
+    """
+    retry_options: Dict[str, Any] = dict(
+        total=retries,
+        read=0,
+        backoff_factor=0.5,
+        # without a forcelist, only 413, 429 and 503 responses with Retry-After are retried
+        status_forcelist=None,
+        # return the last response when out of retries, so raise_for_status reports it
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(allowed_methods=None, **retry_options)
+    except TypeError:  # urllib3 < 1.26
+        retry = Retry(method_whitelist=False, **retry_options)  # type: ignore
+
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
 class MailgunClient(MailClientBase):
     """Mailgun API client.
@@ -16,21 +56,39 @@ class MailgunClient(MailClientBase):
 
     EMAIL_DOMAIN = 'jetbridge.com'
     EMAIL_API_KEY = '12341aef13ababc-bbbba34515-a3cca4'
+
+    Optional:
+
+    ::
+
+    EMAIL_API_BASE_URL = 'https://api.eu.mailgun.net/v3'
+    EMAIL_API_TIMEOUT = 10  # seconds, or a (connect, read) tuple
+    EMAIL_API_POOL_SIZE = 10  # connections kept alive
+    EMAIL_API_RETRIES = 3  # for connection errors and 429 and 503 responses with Retry-After
     """
 
     api_key: str
     domain: str
+    base_url: str
+    session: requests.Session
 
     def __init__(self, config):
         super().__init__(config=config)
         self.api_key = config["EMAIL_API_KEY"]
         self.domain = config["EMAIL_DOMAIN"]
+        self.base_url = config.get("EMAIL_API_BASE_URL", MAILGUN_BASE_URL)
+        self.timeout = config.get("EMAIL_API_TIMEOUT", DEFAULT_TIMEOUT)
+        self.pool_size = config.get("EMAIL_API_POOL_SIZE", DEFAULT_POOL_SIZE)
+        self.session = new_session(
+            pool_size=self.pool_size,
+            retries=config.get("EMAIL_API_RETRIES", DEFAULT_RETRIES),
+        )
 
     def _auth(self) -> Tuple[str, str]:
         return "api", self.api_key
 
     def _send_message_url(self) -> str:
-        return f"{MAILGUN_BASE_URL}/{self.domain}/messages"
+        return f"{self.base_url}/{self.domain}/messages"
 
     def send(
         self,
@@ -43,29 +101,99 @@ class MailgunClient(MailClientBase):
         variables: Mapping[str, str] = None,
         **kwargs,
     ):
-        variables = variables or {}
-
         if not self.enabled:
             return None
 
-        if not sender:
-            sender = self.default_sender
-
-        # send message API request parameters
-        params = {"from": sender, "to": to, "subject": subject}
+        params = self._message_params(
+            subject=subject,
+            template=template,
+            body=body,
+            sender=sender,
+            variables=variables,
+        )
+        params["to"] = to
+        return self._post_message(params)
+
+    def send_batch(
+        self,
+        *,
+        subject: str,
+        recipients: Mapping[str, Mapping[str, Any]],
+        template: str = None,
+        body: str = None,
+        sender: str = None,
+        variables: Mapping[str, str] = None,
+        **kwargs,
+    ) -> List:
+        """Send to many recipients with one request per 1000 recipients, using recipient variables.
+
+        In `body`, refer to recipient variables as `%recipient.name%`.
+        Templates get them like other variables.
+        Requests for different chunks of recipients are sent concurrently.
+        """
+        if not self.enabled or not recipients:
+            return []
+
+        # templates can only see recipient variables through X-Mailgun-Variables
+        recipient_keys = {key for values in recipients.values() for key in values}
+        params = self._message_params(
+            subject=subject,
+            template=template,
+            body=body,
+            sender=sender,
+            variables={
+                **(variables or {}),
+                **{key: f"%recipient.{key}%" for key in recipient_keys},
+            },
+        )
+
+        def send_chunk(emails: List[str]):
+            chunk_params = dict(params)
+            chunk_params["to"] = emails
+            chunk_params["recipient-variables"] = json.dumps(
+                {email: recipients[email] for email in emails}
+            )
+            return self._post_message(chunk_params)
+
+        emails = iter(recipients)
+        chunks = list(
+            iter(lambda: list(itertools.islice(emails, MAX_BATCH_RECIPIENTS)), [])
+        )
+        if len(chunks) == 1:
+            return [send_chunk(chunks[0])]
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.pool_size)) as pool:
+            return list(pool.map(send_chunk, chunks))
+
+    def _message_params(
+        self,
+        *,
+        subject: str,
+        template: Optional[str],
+        body: Optional[str],
+        sender: Optional[str],
+        variables: Optional[Mapping[str, str]],
+    ) -> dict:
+        """Get send message API request parameters, except recipients."""
+        params = {"from": sender or self.default_sender, "subject": subject}
 
         # template
         if template:
             params["template"] = template
-            if variables and variables.keys:
+            if variables:
                 params["h:X-Mailgun-Variables"] = json.dumps(variables)
         elif not body:
             raise RuntimeError("template or body is required for sending email")
         else:
             # have body but not template
             params["text"] = body
-
-        # do request
-        res = requests.post(self._send_message_url(), auth=self._auth(), data=params)
+        return params
+
+    def _post_message(self, params: dict):
+        res = self.session.post(
+            self._send_message_url(),
+            auth=self._auth(),
+            data=params,
+            timeout=self.timeout,
+        )
         res.raise_for_status()
         return res.json()
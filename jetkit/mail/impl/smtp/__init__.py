@@ -0,0 +1,243 @@
+"""Send mail through an SMTP relay, keeping connections open between messages."""
+import queue
+import smtplib
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.message import EmailMessage
+from string import Template
+from typing import Any, Iterator, List, Mapping, Optional
+
+from jetkit.mail.base import MailClientBase
+
+DEFAULT_PORT = 587
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = 30
+
+
+class SMTPConnectionPool:
+    """Up to `size` authenticated SMTP connections, reused across messages.
+
+    Connecting, TLS and authentication happen once per connection instead of once per message.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_PORT,
+        username: str = None,
+        password: str = None,
+        use_ssl: bool = False,
+        starttls: bool = True,
+        size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls and not use_ssl
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[smtplib.SMTP]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        # connections opened over the lifetime of the pool
+        self.connects = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """Check out a connection, waiting if `size` connections are in use."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except smtplib.SMTPServerDisconnected:
+                self._close(conn)
+                raise
+            except Exception:
+                # the connection may be in the middle of a transaction
+                self._reset_or_close(conn)
+                raise
+            self._idle.put(conn)
+
+    def send_message(self, message: EmailMessage) -> None:
+        """Send a message, reconnecting once if the server closed an idle connection."""
+        try:
+            with self.connection() as conn:
+                conn.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            with self.connection() as conn:
+                conn.send_message(message)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            conn: smtplib.SMTP = smtplib.SMTP_SSL(
+                self.host,
+                self.port,
+                timeout=self.timeout,
+                context=ssl.create_default_context(),
+            )
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        conn.ehlo()
+        if self.starttls and conn.has_extn("starttls"):
+            conn.starttls(context=ssl.create_default_context())
+            conn.ehlo()
+        if self.username:
+            conn.login(self.username, self.password or "")
+        self.connects += 1
+        return conn
+
+    def _reset_or_close(self, conn: smtplib.SMTP) -> None:
+        try:
+            conn.rset()
+        except (smtplib.SMTPException, OSError):
+            self._close(conn)
+        else:
+            self._idle.put(conn)
+
+    def _close(self, conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.close()
+
+
+class SMTPClient(MailClientBase):
+    """SMTP client for mail relays.
+
+    SMTP has no server side templates, so `body` is required and
+    variables are substituted into it and `html` as `$name` placeholders.
+
+    Configuration required:
+
+    ::
+
+    EMAIL_SMTP_HOST = 'smtp.example.com'
+
+    Optional:
+
+    ::
+
+    EMAIL_SMTP_PORT = 587
+    EMAIL_SMTP_USERNAME = 'user'
+    EMAIL_SMTP_PASSWORD = 'secret'
+    EMAIL_SMTP_SSL = False  # TLS from the start, usually on port 465
+    EMAIL_SMTP_STARTTLS = True  # upgrade to TLS if the server supports it
+    EMAIL_SMTP_POOL_SIZE = 4  # connections kept open, and messages sent concurrently
+    EMAIL_SMTP_TIMEOUT = 30  # seconds
+    """
+
+    pool: SMTPConnectionPool
+
+    def __init__(self, config):
+        super().__init__(config=config)
+        self.pool = SMTPConnectionPool(
+            host=config["EMAIL_SMTP_HOST"],
+            port=config.get("EMAIL_SMTP_PORT", DEFAULT_PORT),
+            username=config.get("EMAIL_SMTP_USERNAME"),
+            password=config.get("EMAIL_SMTP_PASSWORD"),
+            use_ssl=config.get("EMAIL_SMTP_SSL", False),
+            starttls=config.get("EMAIL_SMTP_STARTTLS", True),
+            size=config.get("EMAIL_SMTP_POOL_SIZE", DEFAULT_POOL_SIZE),
+            timeout=config.get("EMAIL_SMTP_TIMEOUT", DEFAULT_TIMEOUT),
+        )
+
+    def send(
+        self,
+        *,
+        subject: str,
+        to: List[str],
+        template: str = None,
+        body: str = None,
+        html: str = None,
+        sender: str = None,
+        variables: Mapping[str, Any] = None,
+        **kwargs,
+    ):
+        if not self.enabled:
+            return None
+        self.pool.send_message(
+            self.build_message(
+                subject=subject,
+                to=to,
+                template=template,
+                body=body,
+                html=html,
+                sender=sender,
+                variables=variables,
+            )
+        )
+
+    def send_batch(
+        self,
+        *,
+        subject: str,
+        recipients: Mapping[str, Mapping[str, Any]],
+        template: str = None,
+        body: str = None,
+        html: str = None,
+        sender: str = None,
+        variables: Mapping[str, Any] = None,
+        **kwargs,
+    ) -> List:
+        """Send a message to each recipient, over as many connections as the pool allows."""
+        if not self.enabled or not recipients:
+            return []
+
+        messages = [
+            self.build_message(
+                subject=subject,
+                to=[email],
+                template=template,
+                body=body,
+                html=html,
+                sender=sender,
+                variables={**(variables or {}), **recipient_variables},
+            )
+            for email, recipient_variables in recipients.items()
+        ]
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            return list(executor.map(self.pool.send_message, messages))
+
+    def build_message(
+        self,
+        *,
+        subject: str,
+        to: List[str],
+        template: Optional[str],
+        body: Optional[str],
+        html: Optional[str],
+        sender: Optional[str],
+        variables: Optional[Mapping[str, Any]],
+    ) -> EmailMessage:
+        if template:
+            raise RuntimeError(
+                "SMTP doesn't support templates, render the body instead"
+            )
+        if not body:
+            raise RuntimeError("body is required for sending email")
+
+        variables = variables or {}
+        message = EmailMessage()
+        message["From"] = sender or self.default_sender
+        message["To"] = ", ".join(to)
+        message["Subject"] = subject
+        message.set_content(Template(body).safe_substitute(variables))
+        if html:
+            message.add_alternative(
+                Template(html).safe_substitute(variables), subtype="html"
+            )
+        return message
@@ -0,0 +1,159 @@
+"""Send mail queued in the outbox table.
+
+Mail is queued with `MailOutboxMessage.enqueue` in the same transaction as the change it is about,
+so it isn't sent if that transaction rolls back, and request handlers don't wait for the mail API.
+Any number of workers can drain the outbox concurrently:
+each claims a batch of messages with `SELECT ... FOR UPDATE SKIP LOCKED`.
+
+Run a worker from the command line after `register_outbox_commands(app, OutboxWorker(MailOutboxMessage))`:
+
+::
+
+    flask send-mail-outbox --loop
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Optional, Tuple, Type
+
+import click
+from flask import Flask
+from sqlalchemy import func
+
+from jetkit.mail import mail_client
+from jetkit.mail.base import MailClientBase
+from jetkit.mail.constant import MailerImplementation
+from jetkit.model.mail_outbox import MailOutboxMessage
+
+log = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """Send outbox messages in batches, up to `concurrency` at a time.
+
+    Failed messages are retried after `backoff` seconds, doubling for each attempt,
+    until they have been tried `max_attempts` times.
+    Needs a flask app context.
+    """
+
+    def __init__(
+        self,
+        model: Type[MailOutboxMessage],
+        batch_size: int = 100,
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        backoff: float = 30,
+    ):
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def drain(self) -> int:
+        """Send messages until none are due.
+
+        :returns: number of messages sent
+        """
+        sent = 0
+        while True:
+            claimed, batch_sent = self.process_batch()
+            sent += batch_sent
+            if claimed < self.batch_size:
+                return sent
+
+    def run(self, poll_interval: float = 5, stop: threading.Event = None) -> None:
+        """Drain the outbox every `poll_interval` seconds until `stop` is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.drain()
+            except Exception:
+                log.exception("Failed to process mail outbox")
+                self.model.query.session.rollback()
+            stop.wait(poll_interval)
+
+    def process_batch(self) -> Tuple[int, int]:
+        """Claim and send one batch of due messages.
+
+        :returns: number of claimed and sent messages
+        """
+        model = self.model
+        session = model.query.session
+        messages = (
+            model.query.filter(
+                model.sent_at.is_(None),
+                model.attempts < self.max_attempts,
+                model.next_attempt_at <= func.now(),
+            )
+            .order_by(model.next_attempt_at, model.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not messages:
+            session.commit()
+            return 0, 0
+
+        # clients need the app context, which worker threads don't have
+        clients: Dict[MailerImplementation, MailClientBase] = {
+            impl: mail_client(impl=impl, from_flask=True)
+            for impl in {message.impl for message in messages}
+        }
+        started_at = time.monotonic()
+        errors = self._get_pool().map(
+            lambda payload: self._send(*payload),
+            [(clients[message.impl], dict(message.message)) for message in messages],
+        )
+
+        sent = 0
+        for message, error in zip(messages, list(errors)):
+            message.attempts += 1
+            if error is None:
+                message.sent_at = func.now()
+                message.last_error = None
+                sent += 1
+            else:
+                delay = self.backoff * 2 ** (message.attempts - 1)
+                message.next_attempt_at = func.now() + timedelta(seconds=delay)
+                message.last_error = error
+        session.commit()
+        log.info(
+            f"Sent {sent} of {len(messages)} outbox messages in {time.monotonic() - started_at:.2f}s"
+        )
+        return len(messages), sent
+
+    def shutdown(self) -> None:
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _send(self, client: MailClientBase, message: dict) -> Optional[str]:
+        try:
+            client.send(**message)
+        except Exception as ex:
+            log.warning(f"Failed to send outbox message: {ex!r}")
+            return repr(ex)
+        return None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        return self._pool
+
+
+def register_outbox_commands(app: Flask, worker: OutboxWorker) -> None:
+    """Add a `flask send-mail-outbox` command."""
+
+    @app.cli.command("send-mail-outbox")
+    @click.option("--loop", is_flag=True, help="Keep polling for new messages.")
+    @click.option("--poll-interval", default=5.0, help="Seconds between polls.")
+    def send_mail_outbox(loop: bool, poll_interval: float):
+        """Send mail waiting in the outbox."""
+        if loop:
+            worker.run(poll_interval=poll_interval)
+        else:
+            click.echo(f"Sent {worker.drain()} messages")
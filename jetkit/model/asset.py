@@ -4,9 +4,7 @@ import re
 from datetime import datetime
 from typing import Optional
 from uuid import uuid4
-import boto3
 
-from furl import furl
 from sqlalchemy import Index, func
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import relationship
@@ -49,7 +47,10 @@ class Asset(BaseModel, ExtID["Asset"]):
 
     @classmethod
     def filter_query_for_user(cls, query, user):
-        """List only assets created by user."""
+        """List only assets created by user.
+
+        To scope all queries to the current user, use `jetkit.db.owned.OwnedQuery` as `query_class`.
+        """
         return query.filter(cls.owner_id == user.id)
 
     def check_main_type(self, expected_type):
@@ -112,6 +113,8 @@ class S3Asset(Asset, Upsertable):
 
         https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#object
         """
+        import boto3
+
         client = boto3.resource("s3")
         return client.Object(self.s3bucket, self.s3key)
 
@@ -133,7 +136,7 @@ class S3Asset(Asset, Upsertable):
     @classmethod
     def upsert(cls, s3key: str, **kwargs) -> "S3Asset":
         # add defaults for region, bucket if not present
-        row = super().upsert_row(
+        row = cls.upsert_row(
             row_class=cls,
             index_elements=["s3bucket", "s3key"],
             values=dict(
@@ -189,6 +192,8 @@ class S3Asset(Asset, Upsertable):
 
     def s3_direct_url(self) -> str:
         """Generate S3 URL, assumes this is viewable by the world."""
+        from furl import furl
+
         lastmod = self.updated_at or self.created_at
         return str(
             furl(
@@ -0,0 +1,210 @@
+"""Render one template for many sets of variables, and store the documents as assets.
+
+Rendering runs in a process pool. Each worker uploads its document straight to S3,
+so documents are not sent back to the parent process.
+At most `max_in_flight` documents are rendered or uploaded at any time,
+so memory use does not grow with the size of the batch.
+
+::
+
+    result = generate_documents(
+        template,
+        ({"name": user.name} for user in User.query.yield_per(1000)),
+        asset_model=Asset,
+        progress=lambda done, failed: log.info(f"{done} done, {failed} failed"),
+    )
+    db.session.commit()
+"""
+import io
+import logging
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set
+
+from jinja2 import Template as JinjaTemplate
+
+import jetkit.aws.s3 as s3
+from jetkit.model.document_generation.render_cache import render_pdf
+
+log = logging.getLogger(__name__)
+
+# parts of large documents are uploaded concurrently by each worker
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class BatchResult:
+    # position in the variables iterable -> ID of the created asset
+    asset_ids: Dict[int, int] = field(default_factory=dict)
+    # position in the variables iterable -> error
+    failures: Dict[int, str] = field(default_factory=dict)
+
+
+@dataclass
+class _Upload:
+    index: int
+    s3key: str
+    size: int = 0
+
+
+@lru_cache(maxsize=16)
+def _compile(template_text: str) -> JinjaTemplate:
+    return JinjaTemplate(template_text)
+
+
+def _render_and_upload(
+    template_text: str,
+    variables: Mapping,
+    render: Callable[[str], bytes],
+    region: str,
+    bucket: str,
+    key: str,
+    mime_type: str,
+) -> int:
+    """Render and upload one document in a worker process, returning its size."""
+    from boto3.s3.transfer import TransferConfig
+
+    content = render(_compile(template_text).render(**variables))
+    s3.client(region).upload_fileobj(
+        io.BytesIO(content),
+        bucket,
+        key,
+        ExtraArgs={"ContentType": mime_type},
+        Config=TransferConfig(
+            multipart_threshold=MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+        ),
+    )
+    return len(content)
+
+
+def generate_documents(
+    template,
+    variables: Iterable[Mapping],
+    asset_model,
+    render: Callable[[str], bytes] = render_pdf,
+    filename: str = "document.pdf",
+    mime_type: str = "application/pdf",
+    prefix: str = "documents",
+    owner=None,
+    executor: Executor = None,
+    max_in_flight: int = None,
+    insert_batch_size: int = 500,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> BatchResult:
+    """Render `template` with each set of `variables` and store the documents as `asset_model` rows.
+
+    Failing documents don't stop the batch, they are reported in `BatchResult.failures`.
+    Assets are added to the current transaction, commit it afterwards.
+
+    :render: converts the rendered template to the stored file contents, must be picklable.
+    :executor: defaults to a process pool with one worker per CPU.
+    :max_in_flight: documents rendered concurrently, defaults to twice the number of workers.
+    :progress: called with the number of finished and failed documents after each document.
+    """
+    own_executor = executor is None
+    if executor is None:
+        executor = ProcessPoolExecutor()
+    if max_in_flight is None:
+        max_in_flight = 2 * (getattr(executor, "_max_workers", None) or 1)
+
+    defaults = template.variable_default_values or {}
+    required = set(template.required_variables or [])
+    region = s3.get_region()
+    bucket = s3.get_default_bucket()
+    session = asset_model.query.session
+    table = asset_model.__table__
+
+    result = BatchResult()
+    finished: List[_Upload] = []
+    in_flight: Dict[Future, _Upload] = {}
+
+    def insert_finished():
+        if not finished:
+            return
+        rows = [
+            dict(
+                s3bucket=bucket,
+                s3key=upload.s3key,
+                region=region,
+                filename=filename,
+                mime_type=mime_type,
+                size=upload.size,
+                owner_id=owner.id if owner else None,
+            )
+            for upload in finished
+        ]
+        ids = session.execute(
+            table.insert().values(rows).returning(table.c.id)
+        ).fetchall()
+        for upload, (asset_id,) in zip(finished, ids):
+            result.asset_ids[upload.index] = asset_id
+        finished.clear()
+
+    def report_progress():
+        if progress:
+            progress(len(result.asset_ids) + len(finished), len(result.failures))
+
+    def collect(done: Set[Future]):
+        for future in done:
+            upload = in_flight.pop(future)
+            try:
+                upload.size = future.result()
+            except Exception as ex:
+                log.warning(f"Failed to generate document {upload.index}: {ex!r}")
+                result.failures[upload.index] = repr(ex)
+            else:
+                finished.append(upload)
+            report_progress()
+        if len(finished) >= insert_batch_size:
+            insert_finished()
+
+    try:
+        for index, item_variables in enumerate(variables):
+            all_variables = {**defaults, **item_variables}
+            missing = required - all_variables.keys()
+            if missing:
+                result.failures[index] = (
+                    f"Missing variables: {', '.join(sorted(missing))}"
+                )
+                report_progress()
+                continue
+
+            upload = _Upload(
+                index=index,
+                s3key=asset_model.generate_key(filename=filename, prefix=prefix),
+            )
+            future = executor.submit(
+                _render_and_upload,
+                template.template_text,
+                all_variables,
+                render,
+                region,
+                bucket,
+                upload.s3key,
+                mime_type,
+            )
+            in_flight[future] = upload
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        insert_finished()
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    log.info(
+        f"Generated {len(result.asset_ids)} documents, {len(result.failures)} failed"
+    )
+    return result
@@ -0,0 +1,212 @@
+"""Reuse documents rendered from the same template version and variables.
+
+Rendered output is stored as an `S3Asset`, and found again by a hash of
+the template ID, the template's last modification time and the variables.
+Changing the template changes the hash, so outdated renders are never returned.
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import pdfkit
+from sqlalchemy import Column, ForeignKey, Integer, Text, event, func, or_
+from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import Session, joinedload, relationship
+
+import jetkit.aws.s3 as s3
+from jetkit.db import BaseModel
+from jetkit.db.model import TSTZ
+
+log = logging.getLogger(__name__)
+
+# S3 DeleteObjects limit
+S3_DELETE_BATCH_SIZE = 1000
+
+# session.info key of (bucket, key) pairs to delete from S3 when the session commits
+PENDING_S3_DELETES_KEY = "jetkit.pending_s3_deletes"
+
+
+def render_pdf(html: str) -> bytes:
+    return pdfkit.from_string(html, False)
+
+
+def render_cache_key(template, variables: Optional[Mapping] = None) -> str:
+    """Hash everything that determines the output of rendering `template` with `variables`."""
+    all_variables = {**(template.variable_default_values or {}), **(variables or {})}
+    return hashlib.sha256(
+        json.dumps(
+            [
+                template.id,
+                str(template.updated_at or template.created_at),
+                all_variables,
+            ],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+class DocumentRenderCache(BaseModel):
+    """A rendered document stored as an asset.
+
+    Override `template_id` and `asset_id`/`asset` if your tables or models are named differently.
+    """
+
+    key = Column(Text, nullable=False, unique=True)
+    last_used_at = Column(TSTZ, nullable=False, server_default=func.now(), index=True)
+
+    @declared_attr
+    def template_id(self):
+        return Column(
+            Integer,
+            ForeignKey("template.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        )
+
+    @declared_attr
+    def asset_id(self):
+        return Column(
+            Integer, ForeignKey("asset.id", ondelete="CASCADE"), nullable=False
+        )
+
+    @declared_attr
+    def asset(self):
+        return relationship("Asset", foreign_keys=[self.asset_id], uselist=False)
+
+    @classmethod
+    def get_or_render(
+        cls,
+        template,
+        variables: Optional[Mapping] = None,
+        render: Callable[[str], bytes] = render_pdf,
+        filename: str = "document.pdf",
+        mime_type: str = "application/pdf",
+    ):
+        """Get the asset with `template` rendered with `variables`, rendering and uploading it if needed.
+
+        :render: converts the rendered template to the stored file contents.
+        """
+        key = render_cache_key(template, variables)
+        entry = cls.query.filter_by(key=key).one_or_none()
+        if entry:
+            entry.last_used_at = func.now()
+            return entry.asset
+
+        content = render(template.render_template(variables))
+        asset_model = cls.asset.property.mapper.class_
+        asset = asset_model.create(
+            filename=filename, mime_type=mime_type, prefix="documents"
+        )
+        asset.size = len(content)
+        s3.put(
+            key=asset.s3key,
+            content=content,
+            content_type=mime_type,
+            bucket=asset.s3bucket,
+        )
+        session = cls.query.session
+        session.add(asset)
+        session.flush()
+
+        entry = cls.insert_or_ignore(
+            index_elements=["key"],
+            values=dict(key=key, template_id=template.id, asset_id=asset.id),
+        )
+        if entry is None:
+            # rendered concurrently, use the other render
+            session.delete(asset)
+            delete_s3_objects_on_commit(session, [asset])
+            return cls.query.filter_by(key=key).one().asset
+        return asset
+
+    @classmethod
+    def evict(
+        cls, max_entries: Optional[int] = None, ttl: Optional[timedelta] = None
+    ) -> int:
+        """Delete least recently used entries beyond `max_entries`, and entries unused for `ttl`.
+
+        Deletes their assets too, and their S3 objects once the session commits.
+
+        :returns: number of evicted entries
+        """
+        conditions = []
+        if ttl is not None:
+            conditions.append(cls.last_used_at < func.now() - ttl)
+        if max_entries is not None:
+            recent = (
+                cls.query.with_entities(cls.id)
+                .order_by(cls.last_used_at.desc(), cls.id.desc())
+                .limit(max_entries)
+            )
+            conditions.append(cls.id.notin_(recent.subquery()))
+        if not conditions:
+            return 0
+
+        entries = (
+            cls.query.filter(or_(*conditions)).options(joinedload(cls.asset)).all()
+        )
+        assets = [entry.asset for entry in entries]
+
+        session = cls.query.session
+        for entry in entries:
+            session.delete(entry)
+        session.flush()
+        for asset in assets:
+            session.delete(asset)
+        delete_s3_objects_on_commit(session, assets)
+        log.info(f"Evicted {len(entries)} rendered documents")
+        return len(entries)
+
+
+def delete_s3_objects_on_commit(session, assets: List) -> None:
+    """Delete the S3 objects of assets after `session` commits.
+
+    Rolled back deletes of their rows leave the objects in place.
+    """
+    session.info.setdefault(PENDING_S3_DELETES_KEY, []).extend(
+        (asset.s3bucket, asset.s3key) for asset in assets
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _delete_pending_s3_objects(session) -> None:
+    pending = session.info.pop(PENDING_S3_DELETES_KEY, None)
+    if not pending:
+        return
+    try:
+        delete_s3_objects(pending)
+    except Exception:
+        # the rows are gone already, at worst the objects are orphaned
+        log.exception(f"Failed to delete {len(pending)} S3 objects")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_pending_s3_objects(session, transaction) -> None:
+    # after_commit has taken them already unless the transaction was rolled back
+    if transaction.parent is None:
+        session.info.pop(PENDING_S3_DELETES_KEY, None)
+
+
+def delete_s3_objects(objects: Iterable[Tuple[str, str]]) -> None:
+    """Delete S3 objects given as (bucket, key) pairs, in batches."""
+    keys_by_bucket: Dict[str, List[str]] = defaultdict(list)
+    for bucket, key in objects:
+        keys_by_bucket[bucket].append(key)
+
+    client = s3.client()
+    for bucket, keys in keys_by_bucket.items():
+        batches = iter(keys)
+        while True:
+            batch = list(islice(batches, S3_DELETE_BATCH_SIZE))
+            if not batch:
+                break
+            client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
@@ -1,11 +1,43 @@
 import logging
+from typing import Dict
 
+from jinja2 import Template as JinjaTemplate
+from sqlalchemy import event, inspect
 from themis_doc import Template as ThemisTemplate
 
+from jetkit.cache import LRUCache
 from jetkit.db import BaseModel
 
 log = logging.getLogger(__name__)
 
+# (template class, id) -> (last modified, compiled jinja template), shared by all templates in this process
+compiled_templates = LRUCache(maxsize=256)
+
 
 class Template(ThemisTemplate, BaseModel):
-    pass
+    def jinja_template(self, template_config: Dict = None) -> JinjaTemplate:
+        """Get the compiled template, compiling it only once per template version."""
+        if template_config or self.id is None or self._text_changed():
+            return super().jinja_template(template_config)
+
+        key = (type(self), self.id)
+        version = self.updated_at or self.created_at
+        cached = compiled_templates.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        compiled = super().jinja_template()
+        compiled_templates.set(key, (version, compiled))
+        return compiled
+
+    def _text_changed(self) -> bool:
+        """Check for changes to the text not flushed yet."""
+        return inspect(self).attrs.template_text.history.has_changes()
+
+
+def _invalidate(mapper, connection, target):
+    # updated_at alone misses updates made during the same transaction
+    compiled_templates.delete((type(target), target.id))
+
+
+event.listen(Template, "after_update", _invalidate, propagate=True)
+event.listen(Template, "after_delete", _invalidate, propagate=True)
@@ -0,0 +1,42 @@
+"""Mail queued to be sent after the transaction creating it commits."""
+from typing import Any
+
+from sqlalchemy import Column, Enum as SQLAEnum, Integer, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from jetkit.db import BaseModel
+from jetkit.db.model import TSTZ
+from jetkit.mail.constant import MailerImplementation
+
+
+class MailOutboxMessage(BaseModel):
+    """A message to be sent by `jetkit.mail.outbox.OutboxWorker`.
+
+    ::
+
+        class MailOutboxMessage(db.Model, CoreMailOutboxMessage):
+            pass
+
+        MailOutboxMessage.enqueue(MailerImplementation.mailgun, subject="Hi", to=[user.email], template="welcome")
+        db.session.commit()
+    """
+
+    impl = Column(SQLAEnum(MailerImplementation), nullable=False)
+    # keyword arguments for MailClientBase.send
+    message = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(
+        TSTZ, nullable=False, server_default=func.now(), index=True
+    )
+    sent_at = Column(TSTZ, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    @classmethod
+    def enqueue(cls, impl: MailerImplementation, **message: Any) -> "MailOutboxMessage":
+        """Add a message to the outbox in the current transaction. It is sent once that commits."""
+        outbox_message = cls(impl=impl, message=message)
+        cls.query.session.add(outbox_message)
+        return outbox_message
+
+    def __repr__(self):
+        return f"<MailOutboxMessage id={self.id} attempts={self.attempts} sent_at={self.sent_at}>"
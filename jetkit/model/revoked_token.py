@@ -0,0 +1,39 @@
+from typing import Any
+
+from sqlalchemy import Column, DateTime, Text, func, or_
+
+
+class RevokedToken:
+    """Model mixin for revoked JWTs, see `jetkit.api.auth.revocation`.
+
+    Rows without a `jti` revoke all tokens of `identity` issued up to `revoked_at`.
+
+    ::
+
+        class RevokedToken(db.Model, CoreRevokedToken):
+            pass
+    """
+
+    query: Any
+
+    jti = Column(Text(), unique=True, nullable=True)
+    identity = Column(Text(), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=False)
+    # when the revoked tokens expire and this row can be deleted, or None if never
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    @classmethod
+    def unexpired(cls):
+        return cls.query.filter(
+            or_(cls.expires_at.is_(None), cls.expires_at > func.now())
+        )
+
+    @classmethod
+    def delete_expired(cls) -> int:
+        """Delete revocations of tokens that have expired anyway.
+
+        :returns: number of deleted rows
+        """
+        return cls.query.filter(cls.expires_at <= func.now()).delete(
+            synchronize_session=False
+        )
@@ -1,4 +1,5 @@
 from enum import Enum, unique
+from email_normalize import normalize
 from jetkit.db import BaseModel
 from jetkit.db.query.soft_deletable import SoftDeletableQuery
 from jetkit.db.soft_deletable import SoftDeletable
@@ -6,8 +7,8 @@ from jetkit.db.upsert import Upsertable
 from jetkit.db.extid import ExtID
 from sqlalchemy import Date, Text, Column, Enum as SQLAEnum
 from sqlalchemy.ext.hybrid import hybrid_property
-from werkzeug.security import check_password_hash, generate_password_hash
-from sqlalchemy.orm import relationship
+from jetkit.password import get_password_hasher
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.declarative import declared_attr
 
 
@@ -17,6 +18,15 @@ class CoreUserType(Enum):
     admin = "admin"
 
 
+def normalize_email(email: str) -> str:
+    """Get the canonical form of an email address used to look up users.
+
+    Only uses the domain name to detect providers that ignore dots or plus addressing,
+    without DNS lookups.
+    """
+    return normalize(email.strip().lower(), resolve=False)
+
+
 class CoreUserQuery(SoftDeletableQuery):
     pass
 
@@ -32,6 +42,8 @@ class CoreUser(BaseModel, Upsertable, SoftDeletable, ExtID["CoreUser"]):
     __mapper_args__ = {"polymorphic_on": _user_type}
 
     email = Column(Text(), unique=True, nullable=True)
+    # filled when email is set, used for login and sign up
+    normalized_email = Column(Text(), unique=True, nullable=True)
 
     dob = Column(Date())
     name = Column(Text())
@@ -46,13 +58,31 @@ class CoreUser(BaseModel, Upsertable, SoftDeletable, ExtID["CoreUser"]):
             return
         return relationship("Asset", back_populates="createdby")
 
+    @validates("email")
+    def _set_normalized_email(self, key, email):
+        self.normalized_email = normalize_email(email) if email else None
+        return email
+
+    @classmethod
+    def fill_normalized_emails(cls) -> int:
+        """Set `normalized_email` for rows created before it existed, e.g. from a migration.
+
+        :returns: number of updated rows
+        """
+        users = cls.query.filter(
+            cls.normalized_email.is_(None), cls.email.isnot(None)
+        ).all()
+        for user in users:
+            user.normalized_email = normalize_email(user.email)
+        return len(users)
+
     @hybrid_property
     def password(self):
         return self._password
 
     @password.setter  # type: ignore
     def password(self, plaintext):
-        self._password = generate_password_hash(plaintext)
+        self._password = get_password_hasher().hash(plaintext)
 
     @hybrid_property
     def user_type(self) -> CoreUserType:
@@ -64,7 +94,13 @@ class CoreUser(BaseModel, Upsertable, SoftDeletable, ExtID["CoreUser"]):
         self._user_type = new_type
 
     def is_correct_password(self, plaintext):
-        return check_password_hash(self._password, plaintext)
+        return get_password_hasher().verify(self._password, plaintext)
+
+    def password_needs_rehash(self) -> bool:
+        """Check if password hash should be upgraded to the current hashing method."""
+        return bool(self._password) and get_password_hasher().needs_rehash(
+            self._password
+        )
 
     def __repr__(self):
         return f"<User id={self.id} {self.email}>"
@@ -0,0 +1,146 @@
+"""Password hashing off the request thread.
+
+Hashing a password takes hundreds of milliseconds of CPU by design.
+Done in a request handler it holds the GIL and stalls every other request on that worker,
+so `PasswordHasher` runs it in a bounded pool of processes instead.
+
+Configured from flask config:
+
+::
+
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:150000"  # any werkzeug hash method
+    PASSWORD_HASH_SALT_LENGTH = 8
+    PASSWORD_HASH_WORKERS = 4  # processes, 0 to hash in the calling thread
+    PASSWORD_HASH_MAX_PENDING = 64  # hashes running or queued before callers have to wait
+    PASSWORD_HASH_WAIT_TIMEOUT = 1  # seconds to wait for a slot before failing with PasswordHasherBusyError
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+DEFAULT_METHOD = "pbkdf2:sha256"
+DEFAULT_SALT_LENGTH = 8
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 64
+DEFAULT_WAIT_TIMEOUT = 1.0
+
+
+class PasswordHasherBusyError(Exception):
+    """Too many hashes are waiting to be computed."""
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        method: str = DEFAULT_METHOD,
+        salt_length: int = DEFAULT_SALT_LENGTH,
+        workers: int = DEFAULT_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        wait_timeout: Optional[float] = DEFAULT_WAIT_TIMEOUT,
+    ):
+        self.method = normalize_method(method)
+        self.salt_length = salt_length
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.max_pending_seen = 0
+
+    @classmethod
+    def new_from_config(cls, config) -> "PasswordHasher":
+        return cls(
+            method=config.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD),
+            salt_length=config.get("PASSWORD_HASH_SALT_LENGTH", DEFAULT_SALT_LENGTH),
+            workers=config.get("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS),
+            max_pending=config.get("PASSWORD_HASH_MAX_PENDING", DEFAULT_MAX_PENDING),
+            wait_timeout=config.get("PASSWORD_HASH_WAIT_TIMEOUT", DEFAULT_WAIT_TIMEOUT),
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of hashes being computed or waiting to be computed right now."""
+        return self._pending
+
+    def hash(self, plaintext: str) -> str:
+        return self._run(
+            generate_password_hash, plaintext, self.method, self.salt_length
+        )
+
+    def verify(self, pwhash: str, plaintext: str) -> bool:
+        return self._run(check_password_hash, pwhash, plaintext)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Check if a hash was made with a different method or salt length than configured."""
+        if pwhash.count("$") < 2:
+            return True
+        method, salt, _ = pwhash.split("$", 2)
+        return method != self.method or len(salt) != self.salt_length
+
+    def shutdown(self) -> None:
+        """Stop worker processes. They are started again when needed."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown()
+
+    def _run(self, fn: Callable, *args):
+        if not self.workers:
+            return fn(*args)
+
+        with self._lock:
+            self._pending += 1
+            self.max_pending_seen = max(self.max_pending_seen, self._pending)
+        try:
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                raise PasswordHasherBusyError(
+                    f"{self._pending} password hashes pending"
+                )
+            try:
+                return self._get_executor().submit(fn, *args).result()
+            finally:
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+
+def normalize_method(method: str) -> str:
+    """Get the method string werkzeug stores in hashes, e.g. `pbkdf2:sha256:150000`."""
+    if method.startswith("pbkdf2:") and method.count(":") == 1:
+        return f"{method}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+_default_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Get the password hasher for the current flask app, or a default one outside of an app."""
+    from flask import current_app
+
+    global _default_hasher
+
+    if current_app:
+        hasher = current_app.extensions.get("jetkit_password_hasher")
+        if hasher is None:
+            hasher = PasswordHasher.new_from_config(current_app.config)
+            current_app.extensions["jetkit_password_hasher"] = hasher
+        return hasher
+
+    if _default_hasher is None:
+        _default_hasher = PasswordHasher()
+    return _default_hasher
@@ -27,15 +27,12 @@ def create_app(config: dict = None) -> Flask:
     app.config.update(dict(**TEST_CONFIG, **config))
 
     # jwt initialization
-    jwt = JWTManager(app)  # noqa F841
+    jwt = JWTManager(app)
 
-    @jwt.user_loader_callback_loader
-    def user_loader_callback(identity):
-        from jetkit.test.model.user import User
+    from jetkit.api.auth.user_loader import use_jwt_user_loader
+    from jetkit.test.model.user import User
 
-        if identity is None:
-            return None
-        return User.query.get(identity)
+    use_jwt_user_loader(jwt, User, lazy=True)
 
     @jwt.user_loader_error_loader
     def custom_user_loader_error(identity):
@@ -44,11 +41,6 @@ def create_app(config: dict = None) -> Flask:
 
         return jsonify(ret), 404
 
-    @jwt.user_identity_loader
-    def user_identity_lookup(user):
-        assert user.id
-        return user.id
-
     db.init_app(app)  # init sqlalchemy
 
     @app.teardown_appcontext
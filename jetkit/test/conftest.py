@@ -139,6 +139,8 @@ def session(db_session):
 def s3_client():
     import jetkit.aws.s3
 
+    # don't reuse clients made outside of the mock
+    jetkit.aws.s3._client.cache_clear()
     with mock_s3():
         with patch.object(jetkit.aws.s3, "get_region") as get_region_patch:
             get_region_patch.return_value = "us-east-1"
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+
+from jetkit.model.document_generation.document import Document as CoreDocument
+from jetkit.model.document_generation.render_cache import (
+    DocumentRenderCache as CoreDocumentRenderCache,
+)
+from jetkit.model.document_generation.template import Template as CoreTemplate
+from jetkit.test.app import db
+
+
+class Template(db.Model, CoreTemplate):
+    __tablename__ = "template"
+
+
+class Document(db.Model, CoreDocument):
+    __tablename__ = "document"
+
+
+class DocumentRenderCache(db.Model, CoreDocumentRenderCache):
+    asset_id = Column(
+        Integer, ForeignKey("test_asset.id", ondelete="CASCADE"), nullable=False
+    )
+    asset = relationship(
+        "jetkit.test.model.asset.Asset", foreign_keys=[asset_id], uselist=False
+    )
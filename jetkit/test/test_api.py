@@ -0,0 +1,204 @@
+import json
+
+import pytest
+from flask import request
+from flask_smorest import Blueprint
+from marshmallow import Schema, fields
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from jetkit.api import (
+    handle_statement_timeout,
+    handle_version_conflict,
+    searchable_by,
+    sortable_by,
+    statement_timeout,
+    timed_out_endpoints,
+)
+from jetkit.api.cache import cached_response, endpoint_stats
+from jetkit.api.etag import check_if_match, conditional_model
+from jetkit.api.stream import streamed_response
+from jetkit.api.user.schema import UserSchema
+from jetkit.db.versioned import VersionConflict, Versioned
+from jetkit.test.app import db
+from jetkit.test.model.user import User
+
+blp = Blueprint("API test", __name__, url_prefix="/api/test")
+
+
+@blp.route("slow")
+@statement_timeout(50)
+def slow():
+    db.session.execute("SELECT pg_sleep(1)")
+    return "done"
+
+
+@blp.route("slow-search")
+@blp.response(UserSchema(many=True))
+@searchable_by(User.name)
+def slow_search():
+    return User.query.filter(db.func.pg_sleep(1).isnot(None))
+
+
+@pytest.fixture
+def api_test(app):
+    app.register_blueprint(blp)
+    app.register_error_handler(OperationalError, handle_statement_timeout)
+
+
+def test_statement_timeout(client, api_test):
+    timed_out_before = timed_out_endpoints["API test.slow"]
+    response = client.get("/api/test/slow")
+    assert response.status_code == 503
+    assert timed_out_endpoints["API test.slow"] == timed_out_before + 1
+
+
+def test_list_statement_timeout(client, api_test, app):
+    app.config["LIST_STATEMENT_TIMEOUT_MS"] = 50
+    try:
+        response = client.get("/api/test/slow-search")
+    finally:
+        del app.config["LIST_STATEMENT_TIMEOUT_MS"]
+    assert response.status_code == 503
+
+
+@blp.route("export")
+@streamed_response(UserSchema, chunk_size=1)
+@sortable_by(User.email)
+def export_users():
+    return User.query
+
+
+def test_streamed_response(client, api_test, user, admin):
+    response = client.get("/api/test/export?sort_by=email&order=desc")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.data.decode().splitlines()]
+    emails = [row["email"] for row in rows]
+    assert set(emails) >= {user.email, admin.email}
+    assert emails == sorted(emails, reverse=True)
+
+    response = client.get("/api/test/export?format=json")
+    assert len(response.json) == len(rows)
+
+    response = client.get("/api/test/export", headers={"Accept": "text/csv"})
+    assert response.mimetype == "text/csv"
+    lines = response.data.decode().splitlines()
+    assert set(lines[0].split(",")) == {"id", "name", "email", "dob", "phone_number"}
+    assert len(lines) == len(rows) + 1
+
+    response = client.get("/api/test/export?format=xml")
+    assert response.status_code == 400
+
+
+@blp.route("cached")
+@cached_response(User)
+@blp.response(UserSchema(many=True))
+@sortable_by(User.email)
+def cached_users():
+    return User.query
+
+
+def test_cached_response(client, api_test, user, session):
+    stats = endpoint_stats["API test.cached_users"]
+    hits, misses = stats.hits, stats.misses
+
+    response = client.get("/api/test/cached?sort_by=email")
+    assert response.status_code == 200
+    assert client.get("/api/test/cached?sort_by=email").json == response.json
+    assert (stats.hits, stats.misses) == (hits + 1, misses + 1)
+
+    # different arguments are cached separately
+    client.get("/api/test/cached?sort_by=email&order=desc")
+    assert stats.misses == misses + 2
+
+    # changes to users invalidate the cache
+    user.name = "Changed"
+    session.commit()
+    response = client.get("/api/test/cached?sort_by=email")
+    assert stats.misses == misses + 3
+    assert "Changed" in [row["name"] for row in response.json]
+
+
+class VersionedNote(db.Model, Versioned):
+    text = db.Column(db.Text)
+
+
+class NoteSchema(Schema):
+    text = fields.String()
+
+
+@blp.route("note/<int:pk>", methods=["GET"])
+@blp.response(NoteSchema)
+@conditional_model
+def get_note(pk):
+    return VersionedNote.query.get_or_404(pk)
+
+
+@blp.route("note/<int:pk>", methods=["PATCH"])
+def update_note(pk):
+    note = VersionedNote.query.get_or_404(pk)
+    check_if_match(note)
+    note.text = request.json["text"]
+    if "version" in request.json:
+        note.check_version(request.json["version"])
+    if request.json.get("concurrent"):
+        db.session.execute(
+            "UPDATE versioned_note SET version = version + 1 WHERE id = :id",
+            dict(id=pk),
+        )
+    db.session.commit()
+    return note.text
+
+
+def test_versioned(session):
+    note = VersionedNote(text="a")
+    session.add(note)
+    session.commit()
+    assert note.version == 1
+
+    note.text = "b"
+    session.commit()
+    assert note.version == 2
+
+    # changed by someone else meanwhile
+    session.execute(
+        "UPDATE versioned_note SET version = 3 WHERE id = :id", dict(id=note.id)
+    )
+    note.text = "c"
+    with pytest.raises(StaleDataError):
+        session.flush()
+    session.rollback()
+
+    with pytest.raises(VersionConflict):
+        note.check_version(2)
+
+
+def test_versioned_api(client, api_test, app, session):
+    app.register_error_handler(StaleDataError, handle_version_conflict)
+    note = VersionedNote(text="a")
+    session.add(note)
+    session.commit()
+    url = f"/api/test/note/{note.id}"
+
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    assert etag == '"1"'
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    response = client.patch(url, json=dict(text="b"), headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+
+    # stale ETag
+    response = client.patch(url, json=dict(text="c"), headers={"If-Match": etag})
+    assert response.status_code == 412
+
+    # stale version in body
+    response = client.patch(url, json=dict(text="c", version=1))
+    assert response.status_code == 409
+
+    # concurrent update between loading and saving
+    response = client.patch(url, json=dict(text="c", concurrent=True))
+    assert response.status_code == 409
+    assert client.get(url).json == dict(text="b")
@@ -1,6 +1,7 @@
 from jetkit.test.model.asset import Asset
 from time import sleep
 import jetkit.aws.s3 as jetkit_s3
+from jetkit.aws.s3 import S3PresignedUpload
 
 
 def test_asset_upsert(s3_client):
@@ -108,3 +109,12 @@ sample_put_event = {
         }
     ]
 }
+
+
+def test_presigned_upload_serialization():
+    upload = S3PresignedUpload(
+        url="https://bucket/key", headers={"x-amz-acl": "private"}
+    )
+    assert S3PresignedUpload.from_json(upload.to_json()) == upload
+    assert S3PresignedUpload.from_dict(upload.to_dict()) == upload
+    assert S3PresignedUpload.schema().load(upload.to_dict()) == upload
@@ -1,6 +1,19 @@
-from flask_jwt_extended import create_refresh_token, get_jwt_identity
+from flask_jwt_extended import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    get_jwt_identity,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from .conftest import password as correct_password
-from jetkit.api.auth import validate_email
+from jetkit.api import permissions_required
+from jetkit.api.auth import blp, validate_email
+from jetkit.api.auth.token_cache import EXTENSION_KEY, use_verified_token_cache
+from jetkit.api.auth.user_loader import CachedUserLoader
+from jetkit.model.user import CoreUserType
+from jetkit.password import PasswordHasher
+from jetkit.test.model.user import User
 import pytest
 
 incorrect_password = "wrong-password"
@@ -91,6 +104,35 @@ def test_sign_up(client_unauthenticated, app, api_auth, client):
     assert not sign_up_response == 200
 
 
+def test_sign_up_normalized_email(
+    client_unauthenticated, api_auth, session, monkeypatch
+):
+    sign_up_response = client_unauthenticated.post(
+        "/api/auth/sign-up", json=dict(email="Sign.Up+1@gmail.com", password="testo")
+    )
+    assert sign_up_response.status_code == 200
+    user = User.query.filter_by(email="Sign.Up+1@gmail.com").one()
+    assert user.normalized_email == "signup@gmail.com"
+
+    # same mailbox, rejected without hashing the password
+    hashes = []
+    monkeypatch.setattr(
+        PasswordHasher, "hash", lambda self, password: hashes.append(password)
+    )
+    sign_up_response = client_unauthenticated.post(
+        "/api/auth/sign-up", json=dict(email="signup@gmail.com", password="other")
+    )
+    assert sign_up_response.status_code == 400
+    assert not hashes
+    monkeypatch.undo()
+
+    log_in_response = client_unauthenticated.post(
+        "/api/auth/login", json=dict(email=" SIGNUP+2@gmail.com", password="testo")
+    )
+    assert log_in_response.status_code == 200
+    assert log_in_response.json["user"]["email"] == "Sign.Up+1@gmail.com"
+
+
 @pytest.mark.parametrize(
     "test_email,allowed_domains,allowed_emails,expected",
     [
@@ -112,3 +154,93 @@ def test_sign_up(client_unauthenticated, app, api_auth, client):
 )
 def test_validate_email(test_email, allowed_domains, allowed_emails, expected):
     assert validate_email(test_email, allowed_domains, allowed_emails) == expected
+
+
+@pytest.fixture
+def executed_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+@blp.route("admin-only")
+@permissions_required([CoreUserType.admin])
+def admin_only():
+    return "ok"
+
+
+def test_claims_avoid_loading_user(client, user, admin, api_auth, executed_statements):
+    access_token = create_access_token(identity=user)
+    claims = decode_token(access_token)["user_claims"]
+    assert claims == {"user_type": "normal", "extid": str(user.extid)}
+    admin.user_type = CoreUserType.admin
+    admin_token = create_access_token(identity=admin)
+    executed_statements.clear()
+
+    response = client.get("/api/auth/admin-only")
+    assert response.status_code == 404
+    response = client.get(
+        "/api/auth/admin-only",
+        environ_base={"HTTP_AUTHORIZATION": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+
+    assert not [s for s in executed_statements if "test_user" in s]
+
+
+def test_cached_user_loader(app, user, session, executed_statements):
+    session.add(user)
+    session.commit()
+    loader = CachedUserLoader(User)
+
+    assert loader.load(user.id) is user
+    executed_statements.clear()
+    assert loader.load(user.id) is user
+    assert not executed_statements
+
+    # updates invalidate cache
+    user.update(name="Changed")
+    session.commit()
+    executed_statements.clear()
+    assert loader.load(user.id).name == "Changed"
+    assert executed_statements
+
+    # a modified copy in the session is kept
+    user.name = "Unsaved"
+    assert loader.load(user.id) is user
+    assert user.name == "Unsaved"
+
+
+def test_check_deleted_user(client, user, api_auth, session):
+    assert client.get("/api/auth/check").status_code == 200
+    user.mark_deleted()
+    session.commit()
+    assert client.get("/api/auth/check").status_code == 404
+
+
+@pytest.fixture
+def token_cache(app):
+    yield use_verified_token_cache(app)
+    del app.extensions[EXTENSION_KEY]
+
+
+def test_verified_token_cache(client, api_auth, token_cache, monkeypatch):
+    for _ in range(3):
+        assert client.get("/api/auth/check").status_code == 200
+    assert token_cache.stats.misses == 1
+    assert token_cache.stats.hits == 2
+    assert len(token_cache.cache) == 1
+
+    # cached tokens are not verified again
+    monkeypatch.setattr("flask_jwt_extended.utils.decode_jwt", None)
+    assert client.get("/api/auth/check").status_code == 200
+
+    response = client.get(
+        "/api/auth/check", environ_base={"HTTP_AUTHORIZATION": "Bearer invalid"}
+    )
+    assert response.status_code == 422
@@ -0,0 +1,49 @@
+import time
+
+from sqlalchemy.orm import Session
+
+from jetkit.api.cache import SESSION_INFO_KEY
+from jetkit.cache import LRUCache
+from jetkit.test.app import db
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.stats.hits == 3
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_rate == 0.75
+
+
+def test_lru_cache_ttl():
+    cache = LRUCache(ttl=0.01)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_versions():
+    cache = LRUCache(maxsize=1)
+    assert cache.get_version("user") == 0
+    assert cache.incr_version("user") == 1
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get_version("user") == 1
+
+
+def test_rollback_forgets_changed_tables(app):
+    session = Session(bind=db.get_engine(app))
+    session.execute("SELECT 1")
+    session.info[SESSION_INFO_KEY] = {"test_user"}
+    session.rollback()
+    assert SESSION_INFO_KEY not in session.info
+    session.close()
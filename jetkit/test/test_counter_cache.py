@@ -0,0 +1,72 @@
+from sqlalchemy import Column, ForeignKey, Integer, Text
+
+from jetkit.db.counter_cache import counter_cache
+from jetkit.db.soft_deletable import SoftDeletable
+from jetkit.test.app import db
+
+
+class Folder(db.Model):
+    name = Column(Text)
+    file_count = Column(Integer, nullable=False, server_default="0")
+
+
+class File(db.Model, SoftDeletable):
+    folder_id = Column(Integer, ForeignKey("folder.id"))
+
+
+file_count = counter_cache(File.folder_id, Folder.file_count)
+
+
+def counts(*folders):
+    for folder in folders:
+        db.session.refresh(folder)
+    return [folder.file_count for folder in folders]
+
+
+def test_counter_cache(session):
+    a, b = Folder(name="a"), Folder(name="b")
+    db.session.add_all([a, b])
+    db.session.flush()
+    assert counts(a, b) == [0, 0]
+
+    files = [File(folder_id=a.id) for _ in range(3)] + [File()]
+    db.session.add_all(files)
+    db.session.flush()
+    assert counts(a, b) == [3, 0]
+
+    # moved to another folder
+    files[0].folder_id = b.id
+    files[3].folder_id = b.id
+    db.session.flush()
+    assert counts(a, b) == [2, 2]
+
+    # soft-deleted, updated and restored
+    files[1].mark_deleted()
+    db.session.flush()
+    assert counts(a, b) == [1, 2]
+    files[1].folder_id = b.id
+    db.session.flush()
+    assert counts(a, b) == [1, 2]
+    files[1].deleted_at = None
+    db.session.flush()
+    assert counts(a, b) == [1, 3]
+
+    db.session.delete(files[2])
+    db.session.flush()
+    assert counts(a, b) == [0, 3]
+
+
+def test_backfill(session):
+    folders = [Folder(name=str(i)) for i in range(3)]
+    db.session.add_all(folders)
+    db.session.flush()
+    deleted = File(folder_id=folders[0].id)
+    db.session.add_all(
+        [File(folder_id=folders[0].id), File(folder_id=folders[2].id), deleted]
+    )
+    deleted.mark_deleted()
+    db.session.flush()
+    db.session.execute(Folder.__table__.update().values(file_count=7))
+
+    assert file_count.backfill(db.session, batch_size=2) == 3
+    assert counts(*folders) == [1, 0, 1]
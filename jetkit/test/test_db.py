@@ -1,4 +1,8 @@
-from jetkit.db.utils import on_table_create
+import os
+import subprocess
+import sys
+
+from jetkit.db.utils import on_table_create, warm_up
 from jetkit.test.app import db
 from sqlalchemy.schema import DDL
 
@@ -35,3 +39,25 @@ def test_update_attributes(user):
     # TODO: test subfield updates
     user.update(name="fred")
     assert user.name == "fred"
+
+
+def test_warm_up(app):
+    warm_up(db)
+    assert db.engine.pool.checkedin() >= 1
+
+
+def test_lazy_imports():
+    # heavy dependencies are only imported when used
+    modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, jetkit.db, jetkit.api, jetkit.model.asset; print(' '.join(sys.modules))",
+        ],
+        env={**os.environ, "XRAY": ""},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    for heavy in ("aws_xray_sdk", "boto3", "furl", "dataclasses_json"):
+        assert heavy not in modules
@@ -0,0 +1,146 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from jinja2 import Template as JinjaTemplate
+
+from jetkit.model.document_generation.batch import generate_documents
+from jetkit.model.document_generation.render_cache import render_cache_key
+from jetkit.model.document_generation.template import compiled_templates
+from jetkit.test.model.asset import Asset
+from jetkit.test.model.document import DocumentRenderCache, Template
+
+
+@pytest.fixture
+def template(session):
+    template = Template(
+        template_text="<h1>Hello {{ name }}</h1>",
+        variable_default_values={"name": "nobody"},
+    )
+    session.add(template)
+    session.commit()
+    return template
+
+
+def render(html: str) -> bytes:
+    return html.encode()
+
+
+def get_or_render(template, variables):
+    return DocumentRenderCache.get_or_render(
+        template, variables, render=render, filename="hello.html", mime_type="text/html"
+    )
+
+
+def test_render_cache_key(template):
+    assert render_cache_key(template, {"name": "nobody", "x": 1}) == render_cache_key(
+        template, {"x": 1}
+    )
+    assert render_cache_key(template, {"name": "A"}) != render_cache_key(
+        template, {"name": "B"}
+    )
+
+
+def test_render_cache(template, session, s3_bucket, s3_client, mocker):
+    render_spy = mocker.spy(Template, "render_template")
+
+    asset = get_or_render(template, {"name": "A"})
+    session.commit()
+    content = s3_client.get_object(Bucket=asset.s3bucket, Key=asset.s3key)["Body"]
+    assert content.read() == b"<h1>Hello A</h1>"
+
+    assert get_or_render(template, {"name": "A"}) is asset
+    assert render_spy.call_count == 1
+
+    other = get_or_render(template, {"name": "B"})
+    assert other is not asset
+    assert render_spy.call_count == 2
+
+    # changing the template renders again
+    template.template_text = "<h2>Hello {{ name }}</h2>"
+    # now() is constant during a test
+    template.updated_at = template.created_at + timedelta(seconds=1)
+    session.commit()
+    assert get_or_render(template, {"name": "A"}) is not asset
+    session.commit()
+
+
+def test_render_cache_eviction(template, session, s3_bucket, s3_client):
+    assets = [get_or_render(template, {"name": str(n)}) for n in range(3)]
+    session.commit()
+    keys = [asset.s3key for asset in assets]
+
+    assert DocumentRenderCache.evict(max_entries=1) == 2
+    listed = s3_client.list_objects_v2(Bucket=assets[0].s3bucket)["Contents"]
+    assert len(listed) == 3  # kept until commit
+    session.commit()
+    assert DocumentRenderCache.query.count() == 1
+    assert Asset.query.count() == 1
+    remaining = s3_client.list_objects_v2(Bucket=assets[0].s3bucket)["Contents"]
+    assert [obj["Key"] for obj in remaining] == [keys[2]]
+
+    assert DocumentRenderCache.evict(ttl=timedelta(days=1)) == 0
+    assert DocumentRenderCache.evict(ttl=timedelta(0)) == 0
+
+
+def render_or_fail(html: str) -> bytes:
+    if "fail" in html:
+        raise ValueError("can't render")
+    return html.encode()
+
+
+def test_generate_documents(template, session, s3_bucket, s3_client):
+    template.required_variables = ["greeting"]
+    progress = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = generate_documents(
+            template,
+            [
+                {"greeting": "Hi", "name": "A"},
+                {"greeting": "Hi", "name": "fail"},
+                {"name": "B"},
+                {"greeting": "Hi", "name": "C"},
+                {"greeting": "Hi", "name": "D"},
+            ],
+            asset_model=Asset,
+            render=render_or_fail,
+            filename="hello.html",
+            mime_type="text/html",
+            executor=executor,
+            max_in_flight=2,
+            insert_batch_size=2,
+            progress=lambda done, failed: progress.append((done, failed)),
+        )
+    session.commit()
+
+    assert set(result.asset_ids) == {0, 3, 4}
+    assert set(result.failures) == {1, 2}
+    assert "can't render" in result.failures[1]
+    assert result.failures[2] == "Missing variables: greeting"
+    assert len(progress) == 5
+    assert progress[-1] == (3, 2)
+
+    asset = Asset.query.get(result.asset_ids[3])
+    assert asset.mime_type == "text/html"
+    content = s3_client.get_object(Bucket=asset.s3bucket, Key=asset.s3key)["Body"]
+    assert content.read() == b"<h1>Hello C</h1>"
+    assert asset.size == len(b"<h1>Hello C</h1>")
+
+
+def test_compiled_template_cache(template, session, mocker):
+    compiled_templates.clear()
+    compile_spy = mocker.spy(JinjaTemplate, "__new__")
+
+    assert template.render_template({"name": "A"}) == "<h1>Hello A</h1>"
+    assert template.render_template({"name": "B"}) == "<h1>Hello B</h1>"
+    assert compile_spy.call_count == 1
+
+    # unflushed changes are rendered
+    template.template_text = "<h2>{{ name }}</h2>"
+    assert template.render_template({"name": "C"}) == "<h2>C</h2>"
+
+    # updates invalidate
+    session.commit()
+    assert template.render_template({"name": "D"}) == "<h2>D</h2>"
+    assert template.render_template({"name": "E"}) == "<h2>E</h2>"
+    assert compile_spy.call_count == 3
@@ -0,0 +1,116 @@
+import base64
+import json
+
+import pytest
+from flask import Flask, jsonify, request
+
+from jetkit.aws import lambda_handler
+from jetkit.aws.lambda_events import (
+    alb_event,
+    http_api_event,
+    replay,
+    rest_api_event,
+    s3_object_created_event,
+)
+from jetkit.model.asset import UnknownS3Key
+from jetkit.test.model.asset import Asset
+
+
+def create_echo_app() -> Flask:
+    app = Flask("lambda_test")
+
+    @app.route("/echo/<path:name>", methods=["GET", "POST"])
+    def echo(name):
+        response = jsonify(
+            name=name,
+            method=request.method,
+            args=request.args.to_dict(flat=False),
+            json=request.get_json(silent=True),
+            cookie=request.cookies.get("session"),
+            agent=request.headers.get("User-Agent"),
+            url=request.url,
+        )
+        response.set_cookie("a", "1")
+        response.set_cookie("b", "2")
+        return response
+
+    @app.route("/bytes", methods=["POST"])
+    def raw():
+        return request.get_data()[::-1], 200, {"Content-Type": "image/png"}
+
+    return app
+
+
+@pytest.fixture
+def handler():
+    return lambda_handler(create_echo_app)
+
+
+@pytest.mark.parametrize("make_event", [rest_api_event, http_api_event, alb_event])
+def test_http_events(handler, make_event):
+    response = handler(
+        make_event(
+            "POST",
+            "/echo/a%20b" if make_event is not rest_api_event else "/echo/a b",
+            headers={"User-Agent": "test", "Host": "api.example.com"},
+            query={"q": ["1"]} if make_event is not alb_event else {"q": "1"},
+            body={"x": 1},
+        )
+    )
+    assert response["statusCode"] == 200
+    assert not response["isBase64Encoded"]
+    body = json.loads(response["body"])
+    assert body["name"] == "a b"
+    assert body["method"] == "POST"
+    assert body["args"] == {"q": ["1"]}
+    assert body["json"] == {"x": 1}
+    assert body["agent"] == "test"
+    assert body["url"] == "https://api.example.com/echo/a%20b?q=1"
+
+    if make_event is http_api_event:
+        assert len(response["cookies"]) == 2
+    elif make_event is rest_api_event:
+        assert len(response["multiValueHeaders"]["Set-Cookie"]) == 2
+    else:
+        assert response["statusDescription"] == "200 OK"
+        assert response["headers"]["Content-Type"] == "application/json"
+
+
+def test_http_api_cookies_and_binary(handler):
+    response = handler(http_api_event("GET", "/echo/x", cookies=["session=abc"]))
+    assert json.loads(response["body"])["cookie"] == "abc"
+
+    response = handler(http_api_event("POST", "/bytes", body=b"\x00\x01\xff"))
+    assert response["isBase64Encoded"]
+    assert base64.b64decode(response["body"]) == b"\xff\x01\x00"
+
+
+def test_app_created_once():
+    created = []
+
+    def create_app():
+        created.append(1)
+        return create_echo_app()
+
+    handler = lambda_handler(create_app)
+    for _ in range(3):
+        assert handler(http_api_event("GET", "/echo/x"))["statusCode"] == 200
+    assert len(created) == 1
+    assert handler.app.config["SQLALCHEMY_ENGINE_OPTIONS"]["pool_size"] == 1
+
+
+def test_s3_event(app, session, asset_factory, tmp_path):
+    asset = asset_factory(size=None)
+    session.add(asset)
+    session.commit()
+
+    handler = lambda_handler(lambda: app, asset_model=Asset)
+    events = tmp_path / "events.json"
+    events.write_text(
+        json.dumps([s3_object_created_event(asset.s3bucket, asset.s3key, 1234)])
+    )
+    assert replay(handler, str(events)) == [dict(processed=1)]
+    assert asset.size == 1234
+
+    with pytest.raises(UnknownS3Key):
+        handler(s3_object_created_event(asset.s3bucket, "missing", 1))
@@ -0,0 +1,64 @@
+import gc
+import os
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import jetkit.aws.s3
+from jetkit.lifecycle import after_fork, prepare_for_fork
+
+
+@pytest.fixture
+def preloaded_app(app):
+    db_url = app.config["SQLALCHEMY_DATABASE_URI"]
+    app = Flask("preloaded")
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=db_url, SQLALCHEMY_TRACK_MODIFICATIONS=False
+    )
+    db = SQLAlchemy(app)
+    with app.app_context():
+        db.session.execute("SELECT 1")
+        db.session.remove()
+    yield app, db
+    gc.unfreeze()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_prepare_for_fork(preloaded_app):
+    app, db = preloaded_app
+    with app.app_context():
+        assert db.engine.pool.checkedin() == 1
+
+    prepare_for_fork(app)
+    assert gc.get_freeze_count() > 0
+    with app.app_context():
+        assert db.engine.pool.checkedin() == 0
+
+
+def test_after_fork(preloaded_app):
+    app, db = preloaded_app
+    app.extensions["jetkit_mail_clients"] = {}
+    app.extensions["jetkit_password_hasher"] = object()
+    with app.app_context():
+        pool = db.engine.pool
+
+    pid = os.fork()
+    if pid == 0:
+        # worker: must not close the parent's connection
+        after_fork(app)
+        with app.app_context():
+            ok = db.engine.pool is not pool and db.session.execute("SELECT 1").scalar()
+        os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    with app.app_context():
+        # parent connection still works
+        assert db.session.execute("SELECT 2").scalar() == 2
+
+    after_fork(app)
+    assert "jetkit_mail_clients" not in app.extensions
+    assert "jetkit_password_hasher" not in app.extensions
+    assert jetkit.aws.s3._client.cache_info().currsize == 0
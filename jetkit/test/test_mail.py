@@ -1,7 +1,18 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from jetkit.mail import mail_client
 from jetkit.mail.base import MailClientBase
 from jetkit.mail.constant import MailerImplementation
-import requests
+from jetkit.mail.outbox import OutboxWorker
+from jetkit.model.mail_outbox import MailOutboxMessage as CoreMailOutboxMessage
+from jetkit.test.app import db
 import pytest
+import requests
 from unittest.mock import patch
 
 
@@ -24,26 +35,311 @@ def mailgun_client_flask():
 @pytest.fixture
 def mailgun_client_config():
     yield MailClientBase.new_for_impl(
-        impl=MailerImplementation.mailgun, config={"EMAIL_ENABLED": False}
+        impl=MailerImplementation.mailgun,
+        from_flask=False,
+        config=dict(
+            EMAIL_ENABLED=False,
+            EMAIL_SUPPORT="test@test.com",
+            EMAIL_API_KEY="fake-api-key",
+            EMAIL_DOMAIN="jetbridge.com",
+        ),
     )
 
 
+class MailgunStandIn(ThreadingHTTPServer):
+    """Local HTTP server recording requests like the Mailgun API would receive them."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), MailgunStandInHandler)
+        self.requests = []
+        self.connections = 0
+        # statuses to respond with before succeeding
+        self.failures = []
+        # seconds to wait before responding to accepted requests
+        self.delay = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/v3"
+
+
+class MailgunStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):  # noqa: N802
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.server.failures:
+            return self.respond(self.server.failures.pop(0), {"message": "busy"})
+        self.server.requests.append((self.path, parse_qs(body.decode())))
+        time.sleep(self.server.delay)
+        self.respond(200, {"id": f"<{len(self.server.requests)}@test>"})
+
+    def respond(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status in (429, 503):
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
 @pytest.fixture
-def mocked_requests(mocker):
-    mocker.patch.object(requests, "post", autospec=True)
+def mailgun_stand_in():
+    server = MailgunStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mailgun_client(app, mailgun_stand_in):
+    yield MailClientBase.new_for_impl(
+        impl=MailerImplementation.mailgun,
+        from_flask=False,
+        config=dict(app.config, EMAIL_API_BASE_URL=mailgun_stand_in.url),
+    )
 
 
-def test_login(app, mocked_requests, mailgun_client_flask, mailgun_client_config):
+def test_login(app, mailgun_client, mailgun_stand_in, mailgun_client_config):
     test_email = "test@test.com"
-    mailgun_client_flask.send(
+    mailgun_client.send(
         to=[test_email], subject="mail test client", body="automated test"
     )
     mailgun_client_config.send(
         to=[test_email], subject="mail test client", body="automated test"
     )
+    assert len(mailgun_stand_in.requests) == 1
+    path, params = mailgun_stand_in.requests[0]
+    assert path == "/v3/jetbridge.com/messages"
+    assert params["to"] == [test_email]
+    assert params["text"] == ["automated test"]
+
+
+def test_mailgun_connection_reuse_and_retries(mailgun_client, mailgun_stand_in):
+    mailgun_stand_in.failures = [503, 429]
+    for n in range(3):
+        res = mailgun_client.send(to=["a@test.com"], subject=f"{n}", body="body")
+    assert res == {"id": "<3@test>"}
+    assert len(mailgun_stand_in.requests) == 3
+    # retried and later requests used the same connection
+    assert mailgun_stand_in.connections == 1
+
+
+def test_mailgun_no_retry_after_accepting(app, mailgun_stand_in):
+    client = MailClientBase.new_for_impl(
+        impl=MailerImplementation.mailgun,
+        from_flask=False,
+        config=dict(
+            app.config,
+            EMAIL_API_BASE_URL=mailgun_stand_in.url,
+            EMAIL_API_TIMEOUT=(1, 0.2),
+        ),
+    )
+    mailgun_stand_in.delay = 0.5
+    with pytest.raises(requests.exceptions.RequestException):
+        client.send(to=["a@test.com"], subject="once", body="body")
+    assert len(mailgun_stand_in.requests) == 1
+
+    # may have been sent, not retried
+    mailgun_stand_in.delay = 0
+    mailgun_stand_in.failures = [500]
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.send(to=["a@test.com"], subject="once", body="body")
+    assert not mailgun_stand_in.failures
+    assert len(mailgun_stand_in.requests) == 1
+
+
+def test_mail_client_cached_per_app(app):
+    with app.app_context():
+        client = MailClientBase.new_for_impl(impl=MailerImplementation.mailgun)
+        assert MailClientBase.new_for_impl(impl=MailerImplementation.mailgun) is client
 
 
 def test_dummy_mailer(dummy_client):
     with patch.object(dummy_client, "send") as send_patch:
         dummy_client.send()
         send_patch.assert_called_once()
+
+
+def test_mailgun_send_batch(mailgun_client, mailgun_stand_in):
+    recipients = {f"user{n}@test.com": {"name": f"User {n}"} for n in range(2500)}
+    responses = mailgun_client.send_batch(
+        subject="Hello", template="welcome", recipients=recipients
+    )
+    assert len(responses) == 3
+
+    requests = sorted(mailgun_stand_in.requests, key=lambda r: len(r[1]["to"]))
+    assert [len(params["to"]) for _, params in requests] == [500, 1000, 1000]
+    _, params = requests[0]
+    recipient_variables = json.loads(params["recipient-variables"][0])
+    assert recipient_variables == {email: recipients[email] for email in params["to"]}
+    assert json.loads(params["h:X-Mailgun-Variables"][0]) == {
+        "name": "%recipient.name%"
+    }
+
+
+def test_dummy_send_batch(dummy_client):
+    dummy_client.send_batch(
+        subject="Hello",
+        template="welcome",
+        recipients={"a@test.com": {"name": "A"}, "b@test.com": {"name": "B"}},
+        variables={"app": "test"},
+    )
+    assert [(message["to"], message["variables"]) for message in dummy_client.sent] == [
+        (["a@test.com"], {"app": "test", "name": "A"}),
+        (["b@test.com"], {"app": "test", "name": "B"}),
+    ]
+
+
+def test_dummy_keeps_last_messages():
+    dummy = MailClientBase.new_for_impl(
+        impl=MailerImplementation.dummy,
+        from_flask=False,
+        config=dict(
+            EMAIL_ENABLED=True, EMAIL_SUPPORT="test@test.com", EMAIL_DUMMY_MAX_SENT=2
+        ),
+    )
+    for n in range(3):
+        dummy.send(subject=f"{n}", template="t", to=["a@test.com"])
+    assert [message["subject"] for message in dummy.sent] == ["1", "2"]
+
+
+class MailOutboxMessage(db.Model, CoreMailOutboxMessage):
+    pass
+
+
+def test_mail_outbox(app, session):
+    dummy = mail_client(impl=MailerImplementation.dummy, from_flask=True)
+    dummy.sent.clear()
+    for n in range(3):
+        MailOutboxMessage.enqueue(
+            MailerImplementation.dummy, subject=f"{n}", template="t", to=["a@test.com"]
+        )
+    failing = MailOutboxMessage.enqueue(
+        MailerImplementation.dummy, subject="fail", template="t", to=["a@test.com"]
+    )
+    session.commit()
+
+    original_send = dummy.send
+
+    def send(**message):
+        if message["subject"] == "fail":
+            raise ConnectionError("mail API is down")
+        return original_send(**message)
+
+    worker = OutboxWorker(MailOutboxMessage, batch_size=2)
+    with patch.object(dummy, "send", side_effect=send):
+        assert worker.drain() == 3
+        # the failed message is backed off
+        assert worker.drain() == 0
+    assert sorted(message["subject"] for message in dummy.sent) == ["0", "1", "2"]
+    assert failing.attempts == 1
+    assert "mail API is down" in failing.last_error
+    assert failing.sent_at is None
+
+    failing.next_attempt_at = db.func.now()
+    session.commit()
+    assert worker.drain() == 1
+    assert failing.sent_at is not None
+    assert failing.last_error is None
+    worker.shutdown()
+
+
+class SMTPStandIn:
+    """aiosmtpd handler recording received messages."""
+
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):  # noqa: N802
+        self.peers.add(session.peer)
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_stand_in():
+    # not a locked dev dependency, SMTP tests are skipped without it
+    aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = SMTPStandIn()
+    controller = aiosmtpd_controller.Controller(
+        handler, hostname="127.0.0.1", port=port
+    )
+    controller.start()
+    handler.port = port
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def smtp_client(smtp_stand_in):
+    client = MailClientBase.new_for_impl(
+        impl=MailerImplementation.smtp,
+        from_flask=False,
+        config=dict(
+            EMAIL_ENABLED=True,
+            EMAIL_SUPPORT="support@test.com",
+            EMAIL_SMTP_HOST="127.0.0.1",
+            EMAIL_SMTP_PORT=smtp_stand_in.port,
+            EMAIL_SMTP_POOL_SIZE=2,
+        ),
+    )
+    yield client
+    client.pool.close()
+
+
+def test_smtp_send(smtp_client, smtp_stand_in):
+    for n in range(3):
+        smtp_client.send(
+            subject=f"{n}", to=["a@test.com"], body="Hi $name", variables={"name": "A"}
+        )
+    assert len(smtp_stand_in.messages) == 3
+    envelope = smtp_stand_in.messages[0]
+    assert envelope.mail_from == "support@test.com"
+    assert envelope.rcpt_tos == ["a@test.com"]
+    assert b"Hi A" in envelope.content
+    # one connection for all messages
+    assert smtp_client.pool.connects == 1
+
+
+def test_smtp_send_batch(smtp_client, smtp_stand_in):
+    recipients = {f"user{n}@test.com": {"name": f"User {n}"} for n in range(20)}
+    smtp_client.send_batch(subject="Hello", recipients=recipients, body="Hi $name")
+    assert len(smtp_stand_in.messages) == 20
+    assert {envelope.rcpt_tos[0] for envelope in smtp_stand_in.messages} == set(
+        recipients
+    )
+    assert b"Hi User 7" in next(
+        envelope.content
+        for envelope in smtp_stand_in.messages
+        if envelope.rcpt_tos == ["user7@test.com"]
+    )
+    assert smtp_client.pool.connects <= 2
+    assert len(smtp_stand_in.peers) == smtp_client.pool.connects
+
+
+def test_smtp_dead_connection_closed(smtp_client):
+    def reset_by_peer():
+        raise ConnectionResetError()
+
+    # the original error is raised, and the connection isn't reused
+    with pytest.raises(ValueError):
+        with smtp_client.pool.connection() as conn:
+            conn.rset = reset_by_peer
+            raise ValueError("send failed")
+    assert smtp_client.pool._idle.empty()
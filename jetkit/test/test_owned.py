@@ -0,0 +1,68 @@
+from contextlib import contextmanager
+
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+from sqlalchemy import Column, ForeignKey, Integer, Text
+
+import jetkit.api
+from jetkit.db.owned import OwnedQuery, owner_created_at_index
+from jetkit.model.user import CoreUserType
+from jetkit.test.app import db
+
+
+class OwnedNote(db.Model):
+    query_class = OwnedQuery
+    __table_args__ = (owner_created_at_index("owned_note"),)
+
+    owner_id = Column(Integer, ForeignKey("test_user.id"), nullable=False)
+    text = Column(Text)
+
+
+@contextmanager
+def request_as(app, user=None, **token_options):
+    headers = {}
+    if user is not None:
+        token = create_access_token(identity=user, **token_options)
+        headers["Authorization"] = f"Bearer {token}"
+    # a fresh app context, where the verified token is stored
+    with app.app_context(), app.test_request_context(headers=headers):
+        if user is not None:
+            verify_jwt_in_request()
+        yield
+
+
+def test_owned_query(app, session, user, admin, monkeypatch):
+    # the test user model has no admin subclass
+    admin.user_type = CoreUserType.admin
+    db.session.add_all([user, admin])
+    db.session.flush()
+    mine = OwnedNote(owner_id=user.id, text="mine")
+    theirs = OwnedNote(owner_id=admin.id, text="theirs")
+    db.session.add_all([mine, theirs])
+    db.session.flush()
+
+    # outside of requests
+    assert OwnedNote.query.count() == 2
+
+    with request_as(app, user):
+        assert OwnedNote.query.all() == [mine]
+        assert OwnedNote.query.get(mine.id) is mine
+        assert OwnedNote.query.get(theirs.id) is None
+        assert OwnedNote.query.without_filters().count() == 2
+
+    with request_as(app, admin):
+        assert OwnedNote.query.count() == 2
+
+    with request_as(app):
+        assert OwnedNote.query.count() == 0
+        assert OwnedNote.query.get(mine.id) is None
+
+    # no user type claim and no user loader
+    monkeypatch.setattr(jetkit.api, "get_current_user", lambda: None)
+    with request_as(app, admin, user_claims={}):
+        assert [note.id for note in OwnedNote.query] == [theirs.id]
+
+
+def test_owner_created_at_index(session):
+    (index,) = OwnedNote.__table__.indexes
+    assert index.name == "owned_note_owner_id_created_at_idx"
+    assert [column.name for column in index.columns] == ["owner_id", "created_at"]
@@ -0,0 +1,147 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import relationship
+
+from jetkit.db.partitioned import Partitioned, next_partition_start, partition_start
+from jetkit.model.asset import S3Asset
+from jetkit.test.app import db
+
+NOW = datetime(2020, 5, 17, 12, tzinfo=timezone.utc)
+
+
+class PartitionedAsset(Partitioned, db.Model, S3Asset):
+    partition_interval = "month"
+    partitions_ahead = 2
+    partition_retention = 1
+    globally_unique = (("s3bucket", "s3key"),)
+
+    owner_id = Column(Integer, ForeignKey("test_user.id"), nullable=True)
+    owner = relationship("jetkit.test.model.user.User", foreign_keys=[owner_id])
+
+
+def partition_names():
+    return [name for name, _ in PartitionedAsset.partitions()]
+
+
+def add_asset(key: str, created_at: datetime = None):
+    asset = PartitionedAsset(
+        s3bucket="bucket", s3key=key, region="us-east-1", created_at=created_at
+    )
+    db.session.add(asset)
+    db.session.flush()
+    return asset
+
+
+def test_partition_bounds():
+    assert partition_start(NOW, "month") == datetime(2020, 5, 1, tzinfo=timezone.utc)
+    assert partition_start(NOW, "week") == datetime(2020, 5, 11, tzinfo=timezone.utc)
+    assert next_partition_start(
+        datetime(2020, 12, 1, tzinfo=timezone.utc), "month"
+    ) == datetime(2021, 1, 1, tzinfo=timezone.utc)
+    assert next_partition_start(
+        datetime(2020, 1, 1, tzinfo=timezone.utc), "month", -1
+    ) == datetime(2019, 12, 1, tzinfo=timezone.utc)
+
+
+def test_partitions(session):
+    # partitions for now were created with the table
+    current = partition_start(datetime.now(timezone.utc), "month")
+    assert len(partition_names()) == 3
+    assert PartitionedAsset.partitions()[0][1] == current
+
+    asset = add_asset("a")
+    session.commit()
+    assert PartitionedAsset.query.get(asset.id) is asset
+    assert PartitionedAsset.get_by_extid(str(asset.extid)) is asset
+    assert PartitionedAsset.find_by_s3key("bucket", "a") is asset
+
+
+def test_globally_unique(session):
+    add_asset("a", created_at=NOW)
+    add_asset("b")
+    # different partition, same key
+    with pytest.raises(IntegrityError):
+        with session.begin_nested():
+            add_asset("a")
+
+    # keys can be reused once the row is gone
+    asset = PartitionedAsset.find_by_s3key("bucket", "b")
+    asset.s3key = "c"
+    session.flush()
+    add_asset("b")
+
+
+def test_upsert(session, s3_client):
+    asset = PartitionedAsset.upsert("k", mime_type="text/plain")
+    again = PartitionedAsset.upsert("k", mime_type="image/png")
+    assert again.id == asset.id
+    assert again.mime_type == "image/png"
+    assert PartitionedAsset.query.filter_by(s3key="k").count() == 1
+
+    # other violations aren't retried
+    with pytest.raises(IntegrityError) as raised:
+        PartitionedAsset.upsert("k2", owner_id=-1)
+    assert "owner_id" in str(raised.value)
+    assert not PartitionedAsset._is_key_conflict(raised.value, ("s3bucket", "s3key"))
+
+    # as raised when the key was inserted concurrently
+    with pytest.raises(IntegrityError) as raised:
+        with session.begin_nested():
+            session.add(
+                PartitionedAsset(s3bucket=asset.s3bucket, s3key="k", region="us-east-1")
+            )
+    assert PartitionedAsset._is_key_conflict(raised.value, ("s3bucket", "s3key"))
+
+
+def test_retention(session):
+    created = PartitionedAsset.create_partitions(now=NOW)
+    assert len(created) == 3
+    add_asset("old", created_at=NOW)
+    add_asset("current", created_at=datetime(2020, 6, 2, tzinfo=timezone.utc))
+
+    # keeps the current and one past partition
+    later = datetime(2020, 7, 2, tzinfo=timezone.utc)
+    assert PartitionedAsset.drop_expired_partitions(now=later) == [
+        "partitioned_asset_p20200501"
+    ]
+    assert PartitionedAsset.query.filter_by(s3key="current").count() == 1
+    assert PartitionedAsset.query.filter_by(s3key="old").count() == 0
+    # the key is free again
+    add_asset("old")
+
+    even_later = datetime(2020, 8, 2, tzinfo=timezone.utc)
+    assert PartitionedAsset.drop_expired_partitions(now=even_later, detach=True) == [
+        "partitioned_asset_p20200601"
+    ]
+    assert PartitionedAsset.query.filter_by(s3key="current").count() == 0
+    detached = session.execute("SELECT s3key FROM partitioned_asset_p20200601")
+    assert detached.fetchall() == [("current",)]
+
+
+def test_partition_for_default_rows(session):
+    later = datetime(2030, 1, 15, tzinfo=timezone.utc)
+    asset = add_asset("early", created_at=later)
+    session.commit()
+    default = session.execute("SELECT s3key FROM partitioned_asset_default")
+    assert default.fetchall() == [("early",)]
+
+    assert "partitioned_asset_p20300101" in PartitionedAsset.create_partitions(
+        now=later
+    )
+    moved = session.execute("SELECT id FROM partitioned_asset_p20300101")
+    assert moved.fetchall() == [(asset.id,)]
+    assert PartitionedAsset.query.get(asset.id) is asset
+
+    # still globally unique, and triggers work on the default partition again
+    with pytest.raises(IntegrityError):
+        with session.begin_nested():
+            add_asset("early")
+    add_asset("other", created_at=datetime(2040, 1, 1, tzinfo=timezone.utc))
+    default = session.execute("SELECT s3key FROM partitioned_asset_default")
+    assert default.fetchall() == [("other",)]
+    with pytest.raises(IntegrityError):
+        with session.begin_nested():
+            add_asset("other")
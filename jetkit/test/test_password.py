@@ -0,0 +1,65 @@
+from werkzeug.security import generate_password_hash
+
+from jetkit.password import PasswordHasher, PasswordHasherBusyError, get_password_hasher
+from .conftest import password as correct_password
+
+
+def test_password_hasher():
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=2)
+    try:
+        pwhash = hasher.hash("secret")
+        assert pwhash.startswith("pbkdf2:sha256:1000$")
+        assert hasher.verify(pwhash, "secret")
+        assert not hasher.verify(pwhash, "wrong")
+        assert hasher.queue_depth == 0
+        assert hasher.max_pending_seen >= 1
+    finally:
+        hasher.shutdown()
+
+
+def test_needs_rehash():
+    hasher = PasswordHasher(method="pbkdf2:sha256", workers=0)
+    assert not hasher.needs_rehash(hasher.hash("secret"))
+    assert hasher.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:1000"))
+    assert hasher.needs_rehash(generate_password_hash("secret", salt_length=16))
+    assert hasher.needs_rehash("plaintext")
+
+
+def test_login_upgrades_password_hash(
+    user, db_session, client_unauthenticated, api_auth
+):
+    user._password = generate_password_hash(correct_password, "pbkdf2:sha256:1000")
+    db_session.add(user)
+    db_session.commit()
+    assert user.password_needs_rehash()
+
+    response = client_unauthenticated.post(
+        "/api/auth/login", json=dict(email=user.email, password=correct_password)
+    )
+    assert response.status_code == 200
+    assert not user.password_needs_rehash()
+    assert user.password.startswith(get_password_hasher().method + "$")
+    assert user.is_correct_password(correct_password)
+
+
+def test_busy_hasher(user, db_session, client_unauthenticated, api_auth, monkeypatch):
+    user._password = generate_password_hash(correct_password, "pbkdf2:sha256:1000")
+    db_session.add(user)
+    db_session.commit()
+
+    def busy(*args, **kwargs):
+        raise PasswordHasherBusyError()
+
+    monkeypatch.setattr(PasswordHasher, "hash", busy)
+
+    # rehashing on login is skipped
+    response = client_unauthenticated.post(
+        "/api/auth/login", json=dict(email=user.email, password=correct_password)
+    )
+    assert response.status_code == 200
+    assert user.password_needs_rehash()
+
+    response = client_unauthenticated.post(
+        "/api/auth/sign-up", json=dict(email="busy@jetbridge.com", password="secret")
+    )
+    assert response.status_code == 503
@@ -0,0 +1,80 @@
+import pytest
+from flask_smorest import Blueprint
+
+from jetkit.api.rate_limit import (
+    EXTENSION_KEY,
+    InProcessRateLimitBackend,
+    PostgresRateLimitBackend,
+    by_email,
+    rate_limited,
+    retry_after_seconds,
+    use_rate_limit_backend,
+)
+from jetkit.db.rate_limit import RateLimitCounter
+from jetkit.test.app import db
+
+blp = Blueprint("Rate limit test", __name__, url_prefix="/api/rate-limit-test")
+
+
+class RateLimit(db.Model, RateLimitCounter):
+    pass
+
+
+@blp.route("limited", methods=["POST"])
+@rate_limited(3, per=60)
+@rate_limited(1, per=60, key=by_email)
+def limited():
+    return "ok"
+
+
+@pytest.fixture
+def api_rate_limit(app):
+    app.register_blueprint(blp)
+    yield
+    app.extensions.pop(EXTENSION_KEY, None)
+
+
+def test_retry_after_seconds():
+    # allowed
+    assert retry_after_seconds(now=0, per=60, limit=2, previous=0, current=1) is None
+    # current window is full, wait until it has slid out halfway
+    assert retry_after_seconds(now=0, per=60, limit=2, previous=0, current=2) == 90
+    # previous window still counts for 3 / 4 * 4 = 3
+    assert retry_after_seconds(now=15, per=60, limit=3, previous=4, current=0) == 15
+    # never allowed
+    assert retry_after_seconds(now=0, per=60, limit=0, previous=0, current=0) == 60
+
+
+def test_in_process_backend():
+    backend = InProcessRateLimitBackend()
+    assert backend.hit("a", limit=2, per=60) is None
+    assert backend.hit("a", limit=2, per=60) is None
+    assert backend.hit("a", limit=2, per=60) > 0
+    assert backend.hit("b", limit=2, per=60) is None
+
+    backend.sweep(now=10**10)
+    assert not backend._windows
+
+
+@pytest.mark.parametrize("postgres", [False, True])
+def test_rate_limited(client_unauthenticated, app, api_rate_limit, postgres):
+    if postgres:
+        use_rate_limit_backend(app, PostgresRateLimitBackend(RateLimit))
+
+    def post(email):
+        return client_unauthenticated.post(
+            "/api/rate-limit-test/limited", json=dict(email=email)
+        )
+
+    assert post("limit@gmail.com").status_code == 200
+    # same mailbox
+    response = post("li.mit+1@gmail.com")
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 120
+
+    assert post("other@gmail.com").status_code == 200
+    # limit by IP counts rejected requests too
+    assert post("another@gmail.com").status_code == 429
+
+    if postgres:
+        assert RateLimit.query.count() == 3
@@ -0,0 +1,70 @@
+import pytest
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+from jetkit.api.auth import use_logout_api
+from jetkit.api.auth.revocation import RevocationStore
+from jetkit.bloom import BloomFilter
+from jetkit.model.revoked_token import RevokedToken as CoreRevokedToken
+from jetkit.test.app import db
+
+
+class RevokedToken(db.Model, CoreRevokedToken):
+    pass
+
+
+revocation_store = RevocationStore(RevokedToken)
+use_logout_api(revocation_store)
+
+
+@pytest.fixture
+def revocation(app, api_auth):
+    revocation_store.init_app(app)
+    revocation_store.refresh()
+    revocation_store.db_checks = 0
+    yield revocation_store
+    app.config["JWT_BLACKLIST_ENABLED"] = False
+
+
+def test_bloom_filter():
+    bloom = BloomFilter.from_items(str(n) for n in range(1000))
+    assert all(str(n) in bloom for n in range(1000))
+    false_positives = sum(str(n) in bloom for n in range(1000, 11000))
+    assert false_positives < 50
+
+
+def test_logout(client, user, revocation):
+    refresh_token = create_refresh_token(identity=user)
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {refresh_token}"}
+
+    assert client.post("/api/auth/refresh", environ_base=auth).status_code == 200
+    assert revocation.db_checks == 0
+
+    assert client.post("/api/auth/logout", environ_base=auth).status_code == 200
+    assert client.post("/api/auth/refresh", environ_base=auth).status_code == 401
+    assert revocation.db_checks == 1
+
+    # after rebuilding from DB
+    revocation.refresh()
+    assert client.post("/api/auth/refresh", environ_base=auth).status_code == 401
+    assert client.get("/api/auth/check").status_code == 200
+
+
+def test_logout_everywhere(client, user, admin, revocation):
+    refresh_token = create_refresh_token(identity=user)
+    admin_token = create_access_token(identity=admin)
+
+    assert client.post("/api/auth/logout-everywhere").status_code == 200
+    assert client.get("/api/auth/check").status_code == 401
+    response = client.post(
+        "/api/auth/refresh",
+        environ_base={"HTTP_AUTHORIZATION": f"Bearer {refresh_token}"},
+    )
+    assert response.status_code == 401
+
+    revocation.refresh()
+    assert client.get("/api/auth/check").status_code == 401
+    response = client.get(
+        "/api/auth/check", environ_base={"HTTP_AUTHORIZATION": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    assert revocation.db_checks == 0
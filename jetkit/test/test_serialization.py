@@ -0,0 +1,77 @@
+import datetime
+import json
+import uuid
+
+from marshmallow import Schema, fields as f, post_dump
+from marshmallow_enum import EnumField
+
+from jetkit.api.serialization import JSONEncoder, compile_schema, compiled
+from jetkit.api.user.schema import UserSchema
+from jetkit.model.user import CoreUserType
+
+
+class AccountSchema(UserSchema):
+    user_type = EnumField(CoreUserType, by_value=True)
+    kind = EnumField(CoreUserType, attribute="user_type", dump_only=True)
+    created_at = f.DateTime()
+    is_admin = f.Boolean(default=False)
+    login_count = f.Integer()
+
+
+class AuthResponse(Schema):
+    access_token = f.String(dump_only=True)
+    user = f.Nested(AccountSchema)
+    users = f.Nested(UserSchema, many=True, only=("extid", "email"))
+
+
+class TeamSchema(Schema):
+    leader_email = f.Pluck(UserSchema, "email", attribute="leader")
+    member_emails = f.Pluck(UserSchema, "email", attribute="team", many=True)
+    members = f.Nested(UserSchema(many=True))
+
+
+class PostDumpSchema(UserSchema):
+    @post_dump
+    def add_greeting(self, data, **kwargs):
+        return {**data, "greeting": "hi"}
+
+
+def test_compiled_dump_matches_marshmallow(user, admin, session):
+    session.add_all((user, admin))
+    session.commit()
+
+    for schema in (UserSchema(), AccountSchema(), PostDumpSchema()):
+        dump = compile_schema(schema)
+        assert dump(user) == schema.dump(user)
+        assert dump([user, admin], many=True) == schema.dump([user, admin], many=True)
+
+    auth_response = {"access_token": "token", "user": user, "users": [user, admin]}
+    assert compile_schema(AuthResponse())(auth_response) == AuthResponse().dump(
+        auth_response
+    )
+
+    team = {"leader": user, "team": [admin], "members": [user, admin]}
+    assert compile_schema(TeamSchema())(team) == TeamSchema().dump(team)
+
+
+def test_compiled_schema_class():
+    row = dict(
+        extid=uuid.uuid4(),
+        email="test@jetbridge.com",
+        name=None,
+        dob=datetime.date(2000, 1, 1),
+        user_type=CoreUserType.admin,
+        created_at=datetime.datetime(2020, 1, 1, 12, tzinfo=datetime.timezone.utc),
+        login_count="3",
+    )
+    schema = compiled(AccountSchema)(many=True)
+    assert isinstance(schema, AccountSchema)
+    assert schema.dump([row]) == AccountSchema(many=True).dump([row])
+    assert schema.dump([row])[0]["id"] == str(row["extid"])
+
+
+def test_json_encoder(app):
+    data = {"b": CoreUserType.admin, "a": uuid.uuid4(), "c": [1, "ü"]}
+    encoded = JSONEncoder(sort_keys=True).encode(data)
+    assert json.loads(encoded) == json.loads(json.dumps(data, cls=JSONEncoder))
+    assert list(json.loads(encoded).keys()) == ["a", "b", "c"]
@@ -1,5 +1,6 @@
 from jetkit.test.app import db
 from jetkit.db.upsert import Upsertable, OnConflictBehavior
+from jetkit.db.utils import CHANGED_TABLES_KEY
 
 
 class UserWithEmail(db.Model, Upsertable):
@@ -29,3 +30,22 @@ def test_upsert_on_conflict_do_something_or_nothing(session):
         on_conflict=OnConflictBehavior.ON_CONFLICT_DO_NOTHING,
     )
     assert u1.counter == 2
+
+
+def test_insert_or_ignore(session):
+    email = "ignored@jetbridge.com"
+    u1 = UserWithEmail.insert_or_ignore(
+        index_elements=["email"], values=dict(email=email, counter=1)
+    )
+    assert u1.id
+    assert u1.counter == 1
+    assert UserWithEmail.query.get(u1.id) is u1
+    # for cached responses
+    assert "user_with_email" in session.info[CHANGED_TABLES_KEY]
+
+    u2 = UserWithEmail.insert_or_ignore(
+        index_elements=["email"], values=dict(email=email, counter=2)
+    )
+    assert u2 is None
+    session.refresh(u1)
+    assert u1.counter == 1
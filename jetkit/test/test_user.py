@@ -34,3 +34,40 @@ def test_user_details(client, api_user, db_session, user, admin):
     assert deleted_user_response.status_code == 200
     user_not_found_response = client.get(f"/api/user/{user.id}")
     assert user_not_found_response.status_code == 404
+
+
+def test_user_conditional_get(client, api_user, user):
+    response = client.get(f"/api/user/{user.id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response = client.get(f"/api/user/{user.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert not response.data
+
+    response = client.get(
+        f"/api/user/{user.id}",
+        headers={"If-Modified-Since": last_modified},
+    )
+    assert response.status_code == 304
+
+
+def test_user_list_conditional_get(client, api_user, user_factory, session):
+    response = client.get("/api/user")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/user", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # different query arguments make a different response
+    response = client.get("/api/user?page=2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    # new rows make a different response
+    session.add(user_factory())
+    session.commit()
+    response = client.get("/api/user", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag